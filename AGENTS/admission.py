@@ -0,0 +1,86 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+# Concurrent /media calls per worker (0 = no limit). A call past the limit
+# waits up to CALL_QUEUE_TIMEOUT seconds for a line if fewer than CALL_QUEUE
+# calls are already waiting; otherwise it hears the "all lines busy" clip.
+MAX_CALLS = int(os.getenv("MAX_CALLS", "0"))
+CALL_QUEUE = int(os.getenv("CALL_QUEUE", "0"))
+CALL_QUEUE_TIMEOUT = float(os.getenv("CALL_QUEUE_TIMEOUT", "2"))
+
+# In-flight requests per upstream, summed over all calls (0 = no limit).
+# Requests past a limit queue (up to UPSTREAM_QUEUE waiting, for at most
+# UPSTREAM_QUEUE_TIMEOUT seconds) and are shed after that.
+MAX_LLM_REQUESTS = int(os.getenv("MAX_LLM_REQUESTS", "0"))
+MAX_EMBED_REQUESTS = int(os.getenv("MAX_EMBED_REQUESTS", "0"))
+MAX_TTS_REQUESTS = int(os.getenv("MAX_TTS_REQUESTS", "0"))
+UPSTREAM_QUEUE = int(os.getenv("UPSTREAM_QUEUE", "64"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+
+
+class Overloaded(Exception):
+    """A limiter shed the request: its queue was full or the wait timed out."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} limit reached")
+        self.name = name
+
+
+class Limiter:
+    """
+    Concurrency cap with a bounded wait queue. slot() holds one of `limit`
+    places for the duration of the block; when all are taken it waits,
+    unless `queue` callers are already waiting, and gives up after
+    `timeout` seconds. Both give-ups raise Overloaded. A limit of 0 admits
+    everything but still counts what is active.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(limit) if limit > 0 else None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting,
+                "admitted": self.admitted, "rejected": self.rejected}
+
+    async def _acquire(self):
+        if self._sem is None:
+            return
+        if self._sem.locked() and self.waiting >= self.queue:
+            self.rejected += 1
+            raise Overloaded(self.name)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(self.name) from None
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self._sem is not None:
+                self._sem.release()
+
+
+calls = Limiter("calls", MAX_CALLS, CALL_QUEUE, CALL_QUEUE_TIMEOUT)
+llm_requests = Limiter("llm", MAX_LLM_REQUESTS, UPSTREAM_QUEUE, UPSTREAM_QUEUE_TIMEOUT)
+embed_requests = Limiter("embed", MAX_EMBED_REQUESTS, UPSTREAM_QUEUE, UPSTREAM_QUEUE_TIMEOUT)
+tts_requests = Limiter("tts", MAX_TTS_REQUESTS, UPSTREAM_QUEUE, UPSTREAM_QUEUE_TIMEOUT)
+LIMITERS = (calls, llm_requests, embed_requests, tts_requests)
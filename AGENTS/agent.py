@@ -1,12 +1,155 @@
 import asyncio
-from .tts import speak, generate_audio
+import logging
+import os
+from .tts import speak, generate_audio, END_OF_STREAM
 from speechmatics.tts import AsyncClient
 from .convert_audio import Pcm16kToMulaw8k
 from speechmatics.tts import Voice
 from langchain_openai import ChatOpenAI
 from .custom_types import AgentOutput
-from .system_prompts import AGENT_PROMPT
+from .system_prompts import AGENT_PROMPT, FIXED_PHRASES
+from .streaming import ResponseFieldStream, SentenceChunker
+from .phrase_cache import phrase_cache
+from .memory import ConversationMemory
+from .admission import llm_requests, tts_requests
 
+logger = logging.getLogger(__name__)
+
+# How many sentences may be synthesizing ahead of the one being played.
+TTS_LOOKAHEAD = int(os.getenv("TTS_LOOKAHEAD", "2"))
+# PCM chunks (2 KiB, 64 ms each) a TTS request may buffer ahead of playback;
+# a full queue makes generate_audio wait instead of holding a whole answer.
+TTS_QUEUE_CHUNKS = int(os.getenv("TTS_QUEUE_CHUNKS", "64"))
+# Calls share one set of LLM chains and one TTS client built at startup
+# (see SharedClients) instead of building their own.
+SHARED_CLIENTS = os.getenv("SHARED_CLIENTS", "1").lower() in ("1", "true", "yes")
+
+# Use 50ms μ-law frames (400 bytes @8k) to match AssemblyAI/Twilio limits.
+FRAME_MS = 50
+FRAME_BYTES = 8000 * FRAME_MS // 1000
+
+
+async def produce_audio(text: str, queue: asyncio.Queue, voice, client: AsyncClient):
+    try:
+        async with tts_requests.slot():
+            await generate_audio(text, queue, voice, client)
+    except Exception:
+        # Unblock the consumer even if TTS failed part way (or was shed).
+        await queue.put(END_OF_STREAM)
+        raise
+
+
+async def synthesize_frames(text: str, voice, client: AsyncClient, queue: asyncio.Queue, on_audio=None):
+    """
+    Run Speechmatics TTS for `text` and yield padded μ-law frames. Raises
+    the TTS error if synthesis fails part way, once the audio received
+    before the failure has been yielded.
+    """
+    producer = asyncio.create_task(produce_audio(text, queue, voice, client))
+    conv = Pcm16kToMulaw8k(frame_ms=FRAME_MS)
+    try:
+        async for pcm_chunk_16k in speak(queue):
+            if on_audio is not None:
+                on_audio()
+            # pcm_chunk_16k is int16 PCM @ 16kHz
+            for mulaw_frame in conv.feed(pcm_chunk_16k):
+                yield mulaw_frame
+        # A failed producer also ends the queue; tell that apart from a clean finish.
+        await producer
+
+        # End-of-stream: flush + pad last partial frame
+        for mulaw_frame in conv.flush(pad_to_full_frame=True):
+            yield mulaw_frame
+    finally:
+        producer.cancel()
+        # An interrupted answer must not leave PCM behind for the next one.
+        while not queue.empty():
+            queue.get_nowait()
+            queue.task_done()
+
+
+def build_llms():
+    """The structured-output chain and its raw-JSON streaming twin."""
+    llm = ChatOpenAI(model="gpt-4o").with_structured_output(AgentOutput)
+    # Same schema, but streamed as raw JSON so `response` can be spoken early.
+    stream_llm = ChatOpenAI(model="gpt-4o").bind(response_format=AgentOutput)
+    return llm, stream_llm
+
+
+def prime_stream_llm(stream_llm):
+    """
+    LangChain streams structured output through the OpenAI client's
+    beta.chat.completions.stream, and openai imports that package on first
+    attribute access (~0.5 s, blocking the event loop). Touch it now so the
+    first AGENT_STREAM_TTS turn does not pay for it.
+    """
+    return stream_llm.bound.root_async_client.beta.chat.completions
+
+
+class SharedClients:
+    """
+    Process-wide LLM chains and Speechmatics client. The chains are
+    stateless and the TTS client is one pooled aiohttp session, so every
+    call on the worker can use them at once. start() builds them at app
+    startup, which also pays LangChain's first-use schema setup and the
+    streaming client's lazy imports there instead of in the first call;
+    close() at shutdown.
+    """
+
+    def __init__(self):
+        self.llm = None
+        self.stream_llm = None
+        self.tts_client: AsyncClient | None = None
+
+    @property
+    def started(self) -> bool:
+        return self.tts_client is not None
+
+    def start(self):
+        self.llm, self.stream_llm = build_llms()
+        prime_stream_llm(self.stream_llm)
+        self.tts_client = AsyncClient()
+
+    async def close(self):
+        if self.tts_client is not None:
+            await self.tts_client.close()
+        self.llm = self.stream_llm = self.tts_client = None
+
+
+shared_clients = SharedClients()
+
+
+def phrase_sentences(phrases):
+    """The phrases plus each of their sentences, as streaming mode speaks them."""
+    out = []
+    for phrase in phrases:
+        chunker = SentenceChunker()
+        out.append(phrase)
+        out.extend(chunker.feed(phrase) + chunker.flush())
+    return list(dict.fromkeys(out))
+
+
+async def warm_phrase_cache(phrases=FIXED_PHRASES, voice=Voice.SARAH):
+    """Pre-render fixed phrases into the phrase cache (disk hits skip TTS)."""
+    texts = phrase_sentences(phrases)
+    phrase_cache.allow(texts)
+    missing = [t for t in texts if phrase_cache.get(t, voice, FRAME_BYTES) is None]
+    if not missing:
+        return
+    # Reusing the shared client also leaves its TTS connection warm for the first call.
+    client = shared_clients.tts_client or AsyncClient()
+    try:
+        for text in missing:
+            try:
+                frames = [f async for f in synthesize_frames(text, voice, client, asyncio.Queue())]
+            except Exception:
+                # Not cached, so the first call that needs it synthesizes it again.
+                logger.exception("Phrase warm-up failed for %r", text)
+                continue
+            phrase_cache.put(text, voice, FRAME_BYTES, frames)
+    finally:
+        if client is not shared_clients.tts_client:
+            await client.close()
 
 
 class Agent:
@@ -14,38 +157,149 @@ class Agent:
         
         self.VOICE = Voice.SARAH
         self.messages = [{"role": "system", "content": AGENT_PROMPT}]
-        self.tts_client = AsyncClient()
-        self.queue = asyncio.Queue()
-        self.llm = ChatOpenAI(model="gpt-4o").with_structured_output(AgentOutput)
+        self.memory = ConversationMemory()
+        self.queue = asyncio.Queue(maxsize=TTS_QUEUE_CHUNKS)
+        # Without shared clients (CLI use, SHARED_CLIENTS=0) the agent builds and owns its own.
+        self._owns_clients = not shared_clients.started
+        if self._owns_clients:
+            self.llm, self.stream_llm = build_llms()
+            self.tts_client = AsyncClient()
+        else:
+            self.llm, self.stream_llm = shared_clients.llm, shared_clients.stream_llm
+            self.tts_client = shared_clients.tts_client
+        self.last_output: AgentOutput | None = None
+        # Called whenever TTS audio (or a cached phrase) becomes available; used for turn timing.
+        self.on_audio = None
+        # Whether the last speech()/speech_stream() played its whole answer:
+        # False while it runs and after a TTS error, so cut-off audio is never reused.
+        self.speech_complete = False
+
 
+    def _audio_ready(self):
+        if self.on_audio is not None:
+            self.on_audio()
+
+    def _prompt(self):
+        # Compact in place: folded turns live on in memory.summary, not here.
+        self.messages[:] = self.memory.compact(self.messages)
+        return self.messages
 
     async def invoke(self):
-        response: AgentOutput = await self.llm.ainvoke(self.messages)
+        async with llm_requests.slot():
+            response: AgentOutput = await self.llm.ainvoke(self._prompt())
         self.messages.append({"role": "ai", "content": response.response})
         return response
-    
-    async def speech(self, text: str):
-        producer = asyncio.create_task(generate_audio(text, self.queue, self.VOICE, self.tts_client))
-        # Use 50ms μ-law frames (400 bytes @8k) to match AssemblyAI/Twilio limits.
-        conv = Pcm16kToMulaw8k(frame_ms=50)
 
+    async def invoke_stream(self):
+        """
+        Like invoke(), but yields the `response` text sentence by sentence
+        while the LLM is still generating. The parsed AgentOutput is in
+        self.last_output once the generator is exhausted.
+        """
+        self.last_output = None
+        field = ResponseFieldStream()
+        chunker = SentenceChunker()
+        raw = []
+        # The slot is held until the stream ends, not just to the first token.
+        async with llm_requests.slot():
+            async for chunk in self.stream_llm.astream(self._prompt()):
+                if not chunk.content:
+                    continue
+                raw.append(chunk.content)
+                for sentence in chunker.feed(field.feed(chunk.content)):
+                    yield sentence
+        for sentence in chunker.flush():
+            yield sentence
+
+        response = AgentOutput.model_validate_json("".join(raw))
+        self.messages.append({"role": "ai", "content": response.response})
+        self.last_output = response
+
+    async def speech_stream(self, sentences):
+        """
+        Speak sentences from an async iterator as they arrive. Each sentence's
+        TTS request starts as soon as it is available (up to TTS_LOOKAHEAD
+        ahead), while frames are yielded strictly in sentence order through a
+        single Pcm16kToMulaw8k converter.
+        """
+        self.speech_complete = False
+        conv = Pcm16kToMulaw8k(frame_ms=FRAME_MS)
+        pending = asyncio.Queue()
+        lookahead = asyncio.Semaphore(TTS_LOOKAHEAD)
+        producers = []
+
+        async def plan():
+            try:
+                async for sentence in sentences:
+                    cached = phrase_cache.get(sentence, self.VOICE, FRAME_BYTES)
+                    if cached is not None:
+                        pending.put_nowait(cached)
+                        continue
+                    await lookahead.acquire()
+                    queue = asyncio.Queue(maxsize=TTS_QUEUE_CHUNKS)
+                    producer = asyncio.create_task(produce_audio(sentence, queue, self.VOICE, self.tts_client))
+                    producers.append(producer)
+                    pending.put_nowait((queue, producer))
+            finally:
+                pending.put_nowait(None)
+
+        planner = asyncio.create_task(plan())
         try:
-            async for pcm_chunk_16k in speak(self.queue):
-                # pcm_chunk_16k is int16 PCM @ 16kHz
-                for mulaw_frame in conv.feed(pcm_chunk_16k):
-                    # mulaw_frame is 20ms μ-law @ 8kHz (160 bytes)
-                    yield mulaw_frame
+            while (item := await pending.get()) is not None:
+                if isinstance(item, list):
+                    self._audio_ready()
+                    # Pre-rendered μ-law: close out the converter's partial frame first.
+                    for mulaw_frame in conv.flush(pad_to_full_frame=True):
+                        yield mulaw_frame
+                    for mulaw_frame in item:
+                        yield mulaw_frame
+                    continue
+                queue, producer = item
+                async for pcm_chunk_16k in speak(queue):
+                    self._audio_ready()
+                    for mulaw_frame in conv.feed(pcm_chunk_16k):
+                        yield mulaw_frame
+                # Raises if this sentence's TTS failed part way.
+                await producer
+                lookahead.release()
 
-            # End-of-stream: optionally flush + pad last partial frame
             for mulaw_frame in conv.flush(pad_to_full_frame=True):
                 yield mulaw_frame
 
-        except Exception as e:
-            print(e)
-
+            # Surfaces LLM errors raised while iterating `sentences`.
+            await planner
+            self.speech_complete = True
         finally:
-            producer.cancel()
+            planner.cancel()
+            for producer in producers:
+                producer.cancel()
     
+    async def speech(self, text: str):
+        self.speech_complete = False
+        cached = phrase_cache.get(text, self.VOICE, FRAME_BYTES)
+        if cached is not None:
+            self._audio_ready()
+            for mulaw_frame in cached:
+                yield mulaw_frame
+            self.speech_complete = True
+            return
+
+        keep = [] if phrase_cache.wants(text) else None
+        try:
+            async for mulaw_frame in synthesize_frames(text, self.VOICE, self.tts_client, self.queue, self.on_audio):
+                if keep is not None:
+                    keep.append(mulaw_frame)
+                yield mulaw_frame
+        except Exception:
+            # The call goes on without the rest of this answer; nothing is cached.
+            logger.exception("Speech synthesis failed")
+            return
+        if keep:
+            phrase_cache.put(text, self.VOICE, FRAME_BYTES, keep)
+        self.speech_complete = True
+
 
     async def close_tts_client(self):
-        await self.tts_client.close()
+        # The shared client outlives the call; SharedClients.close() shuts it down.
+        if self._owns_clients:
+            await self.tts_client.close()
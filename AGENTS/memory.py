@@ -0,0 +1,152 @@
+import os
+import re
+
+# Prompt budget for everything sent to the LLM, in estimated tokens.
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "4000"))
+# Turns (including the one in progress) kept word for word.
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+# Answered turns that keep their retrieved context, for follow-up questions.
+MEMORY_CONTEXT_TURNS = int(os.getenv("MEMORY_CONTEXT_TURNS", "1"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "400"))
+
+# RAG context blocks are recognised by the opening of build_rag_prompt().
+RAG_CONTEXT_PREFIX = "Use the following context"
+SUMMARY_PREFIX = "Summary of earlier in this call (oldest first):"
+_QUESTION = re.compile(r"Question: (.*)")
+
+
+def count_tokens(text: str) -> int:
+    # ~4 characters per token for English with the GPT-4o tokenizer. An
+    # estimate keeps this free of tokenizer downloads on the hot path.
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + 4  # role and framing overhead
+
+
+def is_context(message: dict) -> bool:
+    return message["role"] == "user" and message["content"].startswith(RAG_CONTEXT_PREFIX)
+
+
+def _clip(text: str, chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= chars else text[:chars - 1].rstrip() + "…"
+
+
+class ConversationMemory:
+    """
+    Keeps Agent.messages under a token budget.
+
+    The system prompt and the last MEMORY_RECENT_TURNS turns are sent word
+    for word. Retrieved-context blocks of older answered turns shrink to a
+    one-line stub (only the last MEMORY_CONTEXT_TURNS keep theirs), and turns
+    that fall out of the recent window become one line each in a rolling
+    summary held in a system message. If that is still over budget, recent
+    turns are folded early, then the summary and finally the live turn's own
+    context are trimmed. The prompt size therefore levels off after a few
+    turns instead of growing with the call.
+    """
+
+    def __init__(self, budget: int = MEMORY_TOKEN_BUDGET, recent_turns: int = MEMORY_RECENT_TURNS,
+                 context_turns: int = MEMORY_CONTEXT_TURNS, summary_tokens: int = MEMORY_SUMMARY_TOKENS):
+        self.budget = budget
+        self.recent_turns = max(recent_turns, 1)
+        self.context_turns = context_turns
+        self.summary_tokens = summary_tokens
+        self.summary: list[str] = []
+        self.last_tokens = 0
+
+    @staticmethod
+    def _turns(messages):
+        turns = []
+        for m in messages:
+            if not turns or (m["role"] == "user" and not is_context(m)):
+                turns.append([m])
+            else:
+                turns[-1].append(m)
+        return turns
+
+    @staticmethod
+    def _stub(message: dict) -> dict:
+        q = _QUESTION.search(message["content"])
+        question = f" Question: {q.group(1).strip()}" if q else ""
+        return {"role": "user", "content": f"{RAG_CONTEXT_PREFIX} [earlier context omitted].{question}"}
+
+    def _fold(self, turn) -> None:
+        question = next((m["content"] for m in turn if m["role"] == "user" and not is_context(m)), "")
+        answers = [m["content"] for m in turn if m["role"] != "user"]
+        line = f"- Caller: {_clip(question, 200)}"
+        if answers:
+            line += f" | You: {_clip(answers[-1], 300)}"
+        self.summary.append(line)
+        self._trim_summary(self.summary_tokens)
+
+    def _trim_summary(self, tokens: int) -> None:
+        while self.summary and count_tokens("\n".join(self.summary)) > tokens:
+            self.summary.pop(0)
+
+    def _summary_message(self, skip: int = 0):
+        lines = self.summary[skip:]
+        if not lines:
+            return []
+        return [{"role": "system", "content": SUMMARY_PREFIX + "\n" + "\n".join(lines)}]
+
+    def _assemble(self, head, kept, current, skip=0):
+        return head + self._summary_message(skip) + [m for t in kept for m in t] + current
+
+    @staticmethod
+    def _size(messages) -> int:
+        return sum(message_tokens(m) for m in messages)
+
+    def compact(self, messages: list[dict]) -> list[dict]:
+        head = messages[:1] if messages and messages[0]["role"] == "system" else []
+        body = [m for m in messages[len(head):] if not m["content"].startswith(SUMMARY_PREFIX)]
+        turns = self._turns(body)
+        current = turns.pop() if turns else []
+
+        split = max(len(turns) - (self.recent_turns - 1), 0)
+        for turn in turns[:split]:
+            self._fold(turn)
+        kept = turns[split:]
+
+        # Stale retrieved context: only the newest answered turns keep it.
+        for i, turn in enumerate(kept):
+            if i < len(kept) - self.context_turns:
+                kept[i] = [self._stub(m) if is_context(m) else m for m in turn]
+
+        out = self._assemble(head, kept, current)
+        if self._size(out) > self.budget:
+            kept = [[self._stub(m) if is_context(m) else m for m in t] for t in kept]
+            out = self._assemble(head, kept, current)
+        while self._size(out) > self.budget and kept:
+            self._fold(kept.pop(0))
+            out = self._assemble(head, kept, current)
+        # Oldest summary lines are left out of this prompt only, so a turn with
+        # unusually large context does not erase the call's history.
+        skip = 0
+        while self._size(out) > self.budget and skip < len(self.summary):
+            skip += 1
+            out = self._assemble(head, kept, current, skip)
+        if self._size(out) > self.budget:
+            current = self._fit_context(current, self.budget - self._size(head))
+            out = self._assemble(head, kept, current, skip)
+
+        self.last_tokens = self._size(out)
+        return out
+
+    def _fit_context(self, turn, budget):
+        """Shorten the live turn's context block(s) so the turn fits `budget`."""
+        others = self._size([m for m in turn if not is_context(m)])
+        blocks = [m for m in turn if is_context(m)]
+        if not blocks:
+            return turn
+        room = max((budget - others) // len(blocks) - 5, 0) * 4  # tokens -> chars
+        out = []
+        for m in turn:
+            if is_context(m) and len(m["content"]) > room:
+                q = _QUESTION.search(m["content"])
+                tail = f"\n\nQuestion: {q.group(1).strip()}\nAnswer concisely using the context above" if q else ""
+                m = {"role": "user", "content": m["content"][:max(room - len(tail), 0)] + tail}
+            out.append(m)
+        return out
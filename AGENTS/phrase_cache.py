@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PhraseAudioCache:
+    """
+    Ready-to-send μ-law frames for fixed phrases, keyed by (text, voice,
+    frame size). Frames live in memory and, when `path` is set, as one
+    <key>.ulaw file per phrase so they survive restarts.
+
+    Only phrases registered with allow() (or warmed) are cached, so free-form
+    answers never grow the cache.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._frames: dict[str, List[bytes]] = {}
+        self._allowed: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _text(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, text: str, voice, frame_bytes: int) -> str:
+        voice = getattr(voice, "value", voice)
+        raw = f"{self._text(text)}\0{voice}\0{frame_bytes}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def allow(self, texts) -> None:
+        self._allowed.update(self._text(t) for t in texts)
+
+    def wants(self, text: str) -> bool:
+        return self._text(text) in self._allowed
+
+    def get(self, text: str, voice, frame_bytes: int) -> Optional[List[bytes]]:
+        if not self.wants(text):
+            return None
+        k = self.key(text, voice, frame_bytes)
+        frames = self._frames.get(k)
+        if frames is None and self.path:
+            file = self.path / f"{k}.ulaw"
+            if file.is_file():
+                data = file.read_bytes()
+                frames = [data[i:i + frame_bytes] for i in range(0, len(data), frame_bytes)]
+                self._frames[k] = frames
+        if frames is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return frames
+
+    def put(self, text: str, voice, frame_bytes: int, frames: List[bytes]) -> None:
+        if not frames or any(len(f) != frame_bytes for f in frames):
+            return
+        k = self.key(text, voice, frame_bytes)
+        self._frames[k] = list(frames)
+        if self.path:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = self.path / f"{k}.tmp"
+            tmp.write_bytes(b"".join(frames))
+            os.replace(tmp, self.path / f"{k}.ulaw")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "phrases": len(self._frames)}
+
+
+phrase_cache = PhraseAudioCache(os.getenv("PHRASE_CACHE_DIR", ".phrase_cache") or None)
@@ -0,0 +1,55 @@
+from typing import Iterator
+
+
+class FrameRing:
+    """
+    Fixed-capacity byte ring that re-frames a stream into equal-size frames.
+
+    The ring holds a whole number of frames and is only ever read a frame at
+    a time, so every frame (and the partial tail) is contiguous and can be
+    handed out as a memoryview of the ring itself: no slicing copies and no
+    shifting the buffer down after each frame. Input larger than the free
+    space is taken in pieces, so capacity never grows.
+
+    A yielded view aliases ring memory and is only valid until the ring is
+    written again; copy it with bytes() if it has to outlive that.
+    """
+
+    def __init__(self, frame_bytes: int, frames: int = 8):
+        if frame_bytes <= 0 or frames <= 0:
+            raise ValueError("frame_bytes and frames must be positive")
+        self.frame_bytes = frame_bytes
+        self._buf = bytearray(frame_bytes * frames)
+        self._view = memoryview(self._buf)
+        self._start = 0  # oldest unread byte; always frame-aligned
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, data) -> Iterator[memoryview]:
+        """Append `data`, yielding each frame as soon as it is complete."""
+        data = memoryview(data)
+        cap = len(self._buf)
+        while data:
+            end = (self._start + self._size) % cap
+            n = min(len(data), cap - self._size, cap - end)
+            self._view[end:end + n] = data[:n]
+            self._size += n
+            data = data[n:]
+            while self._size >= self.frame_bytes:
+                frame = self._view[self._start:self._start + self.frame_bytes]
+                self._start = (self._start + self.frame_bytes) % cap
+                self._size -= self.frame_bytes
+                yield frame
+
+    def tail(self, align: int = 1) -> memoryview:
+        """Take the buffered partial frame, trimmed to a multiple of `align`, and empty the ring."""
+        n = self._size - (self._size % align)
+        out = self._view[self._start:self._start + n]
+        self.clear()
+        return out
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
@@ -0,0 +1,85 @@
+import json
+import re
+from typing import List
+
+_FIELD_START = re.compile(r'"response"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# A sentence ends at . ! ? (or a run of them, e.g. "...") followed by whitespace.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+
+
+class ResponseFieldStream:
+    """
+    Pulls the decoded value of the "response" string field out of a JSON
+    object as it streams in, so text can be spoken before the object closes.
+    """
+
+    def __init__(self):
+        self._raw = ""
+        self._pos = None  # index of the next undecoded char inside the value
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self._raw += chunk
+        if self._pos is None:
+            m = _FIELD_START.search(self._raw)
+            if not m:
+                return ""
+            self._pos = m.end()
+
+        out = []
+        raw, i = self._raw, self._pos
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            # Escapes may be split across chunks; wait for the rest.
+            if i + 1 >= len(raw):
+                break
+            esc = raw[i + 1]
+            if esc == "u":
+                if i + 6 > len(raw):
+                    break
+                out.append(json.loads(f'"{raw[i:i + 6]}"'))
+                i += 6
+            else:
+                out.append(_ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+
+class SentenceChunker:
+    """Buffers streamed text and hands back whole sentences."""
+
+    def __init__(self, min_chars: int = 1):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        out = []
+        start = 0
+        for m in _SENTENCE_END.finditer(self._buf):
+            if m.end() - start < self.min_chars:
+                continue
+            sentence = self._buf[start:m.end()].strip()
+            if sentence:
+                out.append(sentence)
+            start = m.end()
+        self._buf = self._buf[start:]
+        return out
+
+    def flush(self) -> List[str]:
+        tail = self._buf.strip()
+        self._buf = ""
+        return [tail] if tail else []
@@ -43,4 +43,14 @@ USER: "Who won the game?" (after RAG)
 - Say "I think" or speculate
 - Set end_turn: true when query_rag: true
 
-Respond following the instructions every time."""
\ No newline at end of file
+Respond following the instructions every time."""
+
+# Said word for word often enough that their audio is pre-rendered once and
+# served from AGENTS.phrase_cache instead of calling TTS every time.
+CHECKING_PHRASE = "Let me check my database for you. One moment..."
+GREETING_PHRASE = "Hi! How can I help you today?"
+# Played to callers turned away by admission control, and for a turn whose LLM,
+# embedding or TTS request was shed.
+BUSY_PHRASE = "Sorry, all of our lines are busy right now. Please call back in a few minutes."
+RETRY_PHRASE = "Sorry, I'm a little overloaded right now. Could you ask me that again in a moment?"
+FIXED_PHRASES = [CHECKING_PHRASE, GREETING_PHRASE, BUSY_PHRASE, RETRY_PHRASE]
@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 import logging
 import asyncio
 from speechmatics.tts import AsyncClient, Voice, OutputFormat
+from .ring_buffer import FrameRing
 load_dotenv()
 SAMPLE_RATE = 16000
 CHANNELS = 1
@@ -23,25 +24,22 @@ async def generate_audio(text: str, audio_queue: asyncio.Queue, voice: Voice, cl
             voice=voice,
             output_format=OutputFormat.RAW_PCM_16000
         ) as response:
-            buf = bytearray()
+            ring = FrameRing(BYTES_PER_CHUNK, frames=BUFFER_SIZE // BYTES_PER_CHUNK + 1)
 
             async for chunk in response.content.iter_chunked(BUFFER_SIZE):
                 #logger.info(len(chunk))
                 if not chunk:
                     continue
 
-                buf.extend(chunk)
-
-                # Emit full CHUNK_SIZE frames worth of PCM bytes
-                while len(buf) >= BYTES_PER_CHUNK:
-                    out = bytes(buf[:BYTES_PER_CHUNK])
-                    del buf[:BYTES_PER_CHUNK]
-                    await audio_queue.put(out)
+                # Emit full CHUNK_SIZE frames worth of PCM bytes; the queue
+                # outlives the ring slot, so each frame is copied out once.
+                for frame in ring.push(chunk):
+                    await audio_queue.put(bytes(frame))
 
             # Flush remainder (keep sample alignment)
-            remainder = len(buf) - (len(buf) % SAMPLE_WIDTH)
-            if remainder > 0:
-                await audio_queue.put(bytes(buf[:remainder]))
+            remainder = ring.tail(align=SAMPLE_WIDTH)
+            if remainder:
+                await audio_queue.put(bytes(remainder))
 
             await audio_queue.put(END_OF_STREAM)
 
@@ -0,0 +1,151 @@
+import os
+import re
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .collection_version import read_versions, versions_path
+
+# Reuse whole answers (text and μ-law audio) for near-duplicate questions.
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "0").lower() in ("1", "true", "yes")
+# Cosine similarity between question embeddings needed for a hit.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+# Shorter questions ("and the other one?") lean on the conversation too much.
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("ANSWER_CACHE_MIN_WORDS", "4"))
+
+# Words that point back into the conversation: a question using them may
+# mean something else in another call, so it is neither looked up nor stored.
+FOLLOW_UP_WORDS = frozenset("it its that this those these they them their else".split())
+_WORD = re.compile(r"[a-z']+")
+
+
+def self_contained(question: str) -> bool:
+    words = _WORD.findall(question.lower())
+    return len(words) >= ANSWER_CACHE_MIN_WORDS and not FOLLOW_UP_WORDS.intersection(words)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    response: str
+    frames: list[bytes]
+    # Version of each source the answer's context came from, and of the
+    # whole source list, when it was stored.
+    versions: dict[str, str | None]
+    catalog: frozenset
+    created: float
+    hits: int = 0
+
+
+class AnswerCache:
+    """
+    Final answers keyed by question embedding. get() returns the stored
+    answer of the most similar earlier question if the cosine is at least
+    `threshold`, it has not expired, and the collection has not changed
+    under it: every source its context came from must still be at the
+    version it was answered from, and no source may have been added or
+    removed. Versions come from the file the ingest CLI writes (see
+    collection_version); it is re-read whenever it changes on disk.
+
+    Entries are in memory only, least recently hit first out.
+    """
+
+    def __init__(self, collection: str, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL, path=None):
+        self.collection = collection
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._file = versions_path(collection, path)
+        self._path = path
+        self._mtime = None
+        self.versions: dict[str, str] = {}
+        self._entries: list[CachedAnswer] = []
+        self._used: list[float] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._refresh()
+
+    def _refresh(self):
+        try:
+            mtime = self._file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        self.versions = read_versions(self.collection, self._path) if mtime is not None else {}
+        keep = [i for i, e in enumerate(self._entries) if self._valid(e)]
+        self.invalidated += len(self._entries) - len(keep)
+        self._keep(keep)
+
+    def _valid(self, entry: CachedAnswer) -> bool:
+        if entry.catalog != frozenset(self.versions):
+            return False
+        return all(self.versions.get(s) == v for s, v in entry.versions.items())
+
+    def _keep(self, rows):
+        self._entries = [self._entries[i] for i in rows]
+        self._used = [self._used[i] for i in rows]
+        self._vectors = self._vectors[rows] if len(rows) else np.zeros((0, self._vectors.shape[1]), dtype=np.float32)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def get(self, vector) -> CachedAnswer | None:
+        self._refresh()
+        if not self._entries:
+            self.misses += 1
+            return None
+        sims = self._vectors @ self._unit(vector)
+        i = int(np.argmax(sims))
+        entry = self._entries[i]
+        if sims[i] < self.threshold or time.time() - entry.created > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.hits += 1
+        self._used[i] = time.monotonic()
+        return entry
+
+    def put(self, vector, question: str, response: str, frames: list[bytes], sources) -> None:
+        """Store an answer whose retrieved context came from `sources`."""
+        if not frames:
+            return
+        self._refresh()
+        v = self._unit(vector)
+        entry = CachedAnswer(
+            question=question,
+            response=response,
+            frames=list(frames),
+            versions={s: self.versions.get(s) for s in set(sources)},
+            catalog=frozenset(self.versions),
+            created=time.time(),
+        )
+        if self._entries:
+            # A near-duplicate replaces the older answer instead of piling up.
+            sims = self._vectors @ v
+            self._keep([i for i in range(len(self._entries)) if sims[i] < self.threshold])
+        if len(self._entries) >= self.max_entries:
+            oldest = int(np.argmin(self._used))
+            self._keep([i for i in range(len(self._entries)) if i != oldest])
+        self._entries.append(entry)
+        self._used.append(time.monotonic())
+        self._vectors = np.vstack([self._vectors.reshape(-1, len(v)), v[None, :]])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "invalidated": self.invalidated,
+        }
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Per-source content versions of each collection, written by the ingest CLI
+# and watched by the server: COLLECTION_VERSION_DIR/<collection>/versions.json.
+COLLECTION_VERSION_DIR = os.getenv("COLLECTION_VERSION_DIR", ".collection_versions")
+
+
+def versions_path(collection: str, path=None) -> Path:
+    return Path(path or COLLECTION_VERSION_DIR) / collection / "versions.json"
+
+
+def source_version(ids) -> str:
+    """
+    Version of a source's content: point ids are content hashes, so the
+    same chunks give the same version however often the file is re-ingested.
+    """
+    return hashlib.sha256("\n".join(sorted(ids)).encode()).hexdigest()[:16]
+
+
+def read_versions(collection: str, path=None) -> dict[str, str]:
+    file = versions_path(collection, path)
+    if not file.is_file():
+        return {}
+    return json.loads(file.read_text())["sources"]
+
+
+def record_source(collection: str, source: str, ids, path=None) -> bool:
+    """Store the source's version; returns whether it changed."""
+    versions = read_versions(collection, path)
+    version = source_version(ids)
+    if versions.get(source) == version:
+        return False
+    versions[source] = version
+    file = versions_path(collection, path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = file.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"collection": collection, "sources": versions}))
+    os.replace(tmp, file)
+    return True
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+
+from AGENTS.memory import count_tokens
+
+# Packing replaces "paste the raw top-k" between vector search and the prompt.
+RAG_PACKING = os.getenv("RAG_PACKING", "1").lower() in ("1", "true", "yes")
+# Candidates fetched (with their vectors) before MMR and packing.
+RAG_FETCH_K = int(os.getenv("RAG_FETCH_K", "20"))
+# 1.0 ranks purely by relevance; lower values favour chunks unlike those already picked.
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Estimated tokens of retrieved text allowed into one RAG prompt.
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "2000"))
+
+# Shortest shared run (in characters) accepted as splitter overlap between two chunks.
+MIN_OVERLAP = 32
+ITEM_TOKENS = 2  # "- " bullet and blank line around each context in build_rag_prompt
+
+
+def mmr_order(vectors, scores, lambda_: float = RAG_MMR_LAMBDA) -> list[int]:
+    """
+    Maximal marginal relevance: repeatedly pick the candidate with the best
+    lambda * relevance - (1 - lambda) * (max similarity to those already picked).
+    `scores` are the query similarities from the vector store. A None vector
+    (a keyword-only hit) counts as similar to nothing.
+    """
+    dim = len(next(x for x in vectors if x is not None))
+    v = np.array([np.zeros(dim) if x is None else x for x in vectors], dtype=np.float32)
+    v /= np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    sim = v @ v.T
+    rel = np.asarray(scores, dtype=np.float32)
+    closest = np.full(len(rel), -np.inf, dtype=np.float32)
+    left = np.ones(len(rel), dtype=bool)
+    order = []
+    for _ in range(len(rel)):
+        penalty = np.where(np.isfinite(closest), closest, 0.0)
+        mmr = np.where(left, lambda_ * rel - (1 - lambda_) * penalty, -np.inf)
+        i = int(np.argmax(mmr))
+        order.append(i)
+        left[i] = False
+        closest = np.maximum(closest, sim[i])
+    return order
+
+
+def merge(a: str, b: str) -> str | None:
+    """
+    a followed by b with the overlap stripped, if b starts with a's tail
+    (how SentenceSplitter's chunk_overlap leaves adjacent chunks); else None.
+    """
+    probe = b[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return None
+    start = max(len(a) - len(b), 0)
+    while (p := a.find(probe, start)) >= 0:
+        if b.startswith(a[p:]):
+            return a + b[len(a) - p:]
+        start = p + 1
+    return None
+
+
+def _join(text: str, other: str) -> str | None:
+    if other in text:
+        return text
+    if text in other:
+        return other
+    return merge(text, other) or merge(other, text)
+
+
+def _add(pieces: list[dict], text: str, source: str, score: float, rel: float) -> list[dict]:
+    """pieces plus one chunk, merged into any same-source piece it touches."""
+    piece = {"text": text, "source": source, "score": score, "rel": rel}
+    rest = []
+    for p in pieces:
+        joined = _join(piece["text"], p["text"]) if p["source"] == source else None
+        if joined is None:
+            rest.append(p)
+        else:
+            # A chunk can bridge two pieces, so keep folding into the grown piece.
+            piece = {"text": joined, "source": source,
+                     "score": max(piece["score"], p["score"]), "rel": max(piece["rel"], p["rel"])}
+    return rest + [piece]
+
+
+def _tokens(pieces) -> int:
+    return sum(count_tokens(p["text"]) + ITEM_TOKENS for p in pieces)
+
+
+def _truncate(text: str, tokens: int) -> str:
+    limit = max(tokens - ITEM_TOKENS, 0) * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a sentence or line if that keeps at least half of it.
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[:end + 1] if end > limit // 2 else cut
+
+
+def pack_context(found: dict, budget: int = RAG_CONTEXT_TOKENS, lambda_: float = RAG_MMR_LAMBDA) -> dict:
+    """
+    Turn over-fetched search results into the contexts for one prompt:
+    candidates are visited in MMR order (by relevance alone if the store
+    returned no vectors), each is merged with an adjacent chunk of the same
+    source already taken (overlap stripped, so only its new text costs
+    tokens), and anything that would overflow `budget` is skipped.
+
+    Relevance is found["relevance"] when present (hybrid search) and the
+    scores otherwise. Returns the same shape as a store search, most
+    relevant first, without the vectors.
+    """
+    contexts = found["contexts"]
+    if not contexts:
+        return {"contexts": [], "sources": [], "scores": [], "context_sources": []}
+    scores = found["scores"]
+    relevance = found.get("relevance") or scores
+    sources = found.get("context_sources") or [""] * len(contexts)
+    if any(v is not None for v in found.get("vectors") or ()):
+        order = mmr_order(found["vectors"], relevance, lambda_)
+    else:
+        order = sorted(range(len(contexts)), key=lambda i: -relevance[i])
+
+    pieces = []
+    for i in order:
+        grown = _add(pieces, contexts[i], sources[i], scores[i], relevance[i])
+        if _tokens(grown) <= budget:
+            pieces = grown
+        elif not pieces:
+            # Even the best chunk alone is over budget: send what fits of it.
+            pieces = [{"text": _truncate(contexts[i], budget), "source": sources[i],
+                       "score": scores[i], "rel": relevance[i]}]
+
+    pieces.sort(key=lambda p: -p["rel"])
+    return {
+        "contexts": [p["text"] for p in pieces],
+        "sources": list(dict.fromkeys(p["source"] for p in pieces)),
+        "scores": [p["score"] for p in pieces],
+        "context_sources": [p["source"] for p in pieces],
+    }
@@ -7,11 +7,14 @@ class RAGChunkAndSrc(pydantic.BaseModel):
 
 class RagUpsertResult(pydantic.BaseModel):
     ingested: int
+    skipped: int = 0
+    deleted: int = 0
 
 
 class RagSearchResult(pydantic.BaseModel):
     contexts: list[str]
     sources: list[str]
+    scores: list[float] = []
 
 class RagQueryResult(pydantic.BaseModel):
     answer: str
@@ -1,27 +1,63 @@
-from openai import OpenAI
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
+import os
+
 from dotenv import load_dotenv
+
+try:
+    from .pdf_chunker import Chunk, iter_chunks
+    from .embeddings import EMBED_MODEL, EMBED_DIM, embed_texts
+except ImportError:  # run as a script from RAG/ (the ingest CLI)
+    from pdf_chunker import Chunk, iter_chunks
+    from embeddings import EMBED_MODEL, EMBED_DIM, embed_texts
 load_dotenv()
 
-client = OpenAI()
-EMBED_MODEL = "text-embedding-3-large"
-EMBED_DIM = 3072
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# "fast": pdf_chunker (pypdf pages streamed into a token splitter, chunks may
+# span pages). "llama": PDFReader + SentenceSplitter, one page at a time.
+PDF_ENGINE = os.getenv("PDF_ENGINE", "fast")
 
-splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=200)
+_splitter = None
 
-def load_and_chunk_pdf(path: str):
+
+def _iter_llama_chunks(path: str, stats: dict | None = None):
+    # llama_index takes over a second to import; only this engine needs it.
+    from llama_index.readers.file import PDFReader
+    from llama_index.core.node_parser import SentenceSplitter
+
+    global _splitter
+    if _splitter is None:
+        _splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     docs = PDFReader().load_data(file=path)
-    texts = [d.text for d in docs if getattr(d, "text", None)]
-    chunks = []
-    for t in texts:
-        chunks.extend(splitter.split_text(t))
-    return chunks
-
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=texts,
-    )
-
-    return [item.embedding for item in response.data]
\ No newline at end of file
+    if stats is not None:
+        stats["pages"] = len(docs)
+    for page, d in enumerate(docs, start=1):
+        t = getattr(d, "text", None)
+        if t:
+            for text in _splitter.split_text(t):
+                yield Chunk(text, page, page)
+
+
+def iter_pdf_records(path: str, stats: dict | None = None, workers: int | None = None, engine: str | None = None):
+    """
+    Yield Chunk records (text plus the pages it came from) for a PDF.
+    Pass a dict as `stats` to get the page count back in stats["pages"];
+    `workers` caps page-parallel extraction in the fast engine.
+    """
+    engine = engine or PDF_ENGINE
+    if engine == "fast":
+        return iter_chunks(path, CHUNK_SIZE, CHUNK_OVERLAP, stats=stats, workers=workers)
+    if engine == "llama":
+        return _iter_llama_chunks(path, stats)
+    raise ValueError(f"Unknown PDF_ENGINE: {engine}")
+
+
+def iter_pdf_chunks(path: str, stats: dict | None = None, workers: int | None = None):
+    """
+    Yield chunk texts page by page instead of building the full list up front.
+    Pass a dict as `stats` to get the page count back in stats["pages"].
+    """
+    for chunk in iter_pdf_records(path, stats, workers):
+        yield chunk.text
+
+def load_and_chunk_pdf(path: str):
+    return list(iter_pdf_chunks(path))
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+log = logging.getLogger("uvicorn.error")
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", text.casefold()).strip()
+    return text.rstrip(" ?.!,")
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU + TTL cache of query embeddings keyed on (model, normalized text).
+    Vectors are held as float32 arrays. When `path` is set, entries are also
+    written to a SQLite file so the cache survives restarts.
+
+    No disk I/O runs on the event loop: start() opens the file in a worker
+    thread, a lookup that misses memory reads it in one, and puts are
+    queued for a single writer task that commits them in batches. The file
+    is pruned to the newest `max_entries` rows within `ttl` on every commit.
+    """
+
+    WRITE_BATCH = 64
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 7 * 24 * 3600, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, array]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+
+    async def start(self):
+        if self.path:
+            self._db = await asyncio.to_thread(self._open)
+            self._writes = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, created REAL NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._prune(db)
+        db.commit()
+        return db
+
+    def _prune(self, db):
+        db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,))
+        db.execute(
+            "DELETE FROM embeddings WHERE key NOT IN "
+            "(SELECT key FROM embeddings ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_query(text)}".encode()).hexdigest()
+
+    async def get(self, text: str, model: str) -> list[float] | None:
+        k = self.key(text, model)
+        with self._lock:
+            entry = self._entries.get(k)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._read, k)
+
+        now = time.time()
+        with self._lock:
+            if entry is not None and now - entry[0] > self.ttl:
+                self._entries.pop(k, None)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._store(k, entry)
+            self.hits += 1
+            return entry[1].tolist()
+
+    def put(self, text: str, model: str, vector: list[float]) -> None:
+        k = self.key(text, model)
+        entry = (time.time(), array("f", vector))
+        with self._lock:
+            self._store(k, entry)
+        if self._writes is not None:
+            self._writes.put_nowait((k, entry[0], entry[1].tobytes()))
+
+    def _store(self, k, entry):
+        self._entries[k] = entry
+        self._entries.move_to_end(k)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read(self, k):
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT created, vector FROM embeddings WHERE key = ?", (k,)
+            ).fetchone()
+        return None if row is None else (row[0], array("f", row[1]))
+
+    def _write(self, rows):
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, created, vector) VALUES (?, ?, ?)", rows
+            )
+            self._prune(self._db)
+            self._db.commit()
+
+    async def _write_loop(self):
+        while True:
+            rows = [await self._writes.get()]
+            while len(rows) < self.WRITE_BATCH and not self._writes.empty():
+                rows.append(self._writes.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except sqlite3.Error as e:
+                # Entries stay cached in memory; only persistence is lost.
+                log.warning("Embedding cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+            rows = []
+            while not self._writes.empty():
+                rows.append(self._writes.get_nowait())
+            if rows:
+                await asyncio.to_thread(self._write, rows)
+        if self._db is not None:
+            await asyncio.to_thread(self._close_db)
+
+    def _close_db(self):
+        with self._db_lock:
+            self._db.close()
+            self._db = None
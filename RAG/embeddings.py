@@ -0,0 +1,19 @@
+from openai import OpenAI
+
+EMBED_MODEL = "text-embedding-3-large"
+EMBED_DIM = 3072
+
+_client: OpenAI | None = None
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Blocking embeddings call for the ingest CLIs (the server uses Retriever)."""
+    global _client
+    if _client is None:
+        _client = OpenAI()
+    response = _client.embeddings.create(
+        model=EMBED_MODEL,
+        input=texts,
+    )
+
+    return [item.embedding for item in response.data]
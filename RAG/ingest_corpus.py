@@ -0,0 +1,145 @@
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from pathlib import Path
+
+from data_loader import iter_pdf_records
+from ingest_pipeline import run_pipeline, chunk_points, EMBED_BATCH_SIZE, MAX_IN_FLIGHT
+from ingest_manifest import IncrementalSource
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileReport:
+    path: str
+    source: str
+    pages: int = 0
+    chunks: int = 0
+    parse_seconds: float = 0.0
+    skipped: int = 0
+    deleted: int = 0
+    error: str | None = None
+
+
+def discover_pdfs(directory=None, pattern=None, manifest=None) -> list[tuple[Path, str | None]]:
+    """
+    Collect (path, source_id) pairs from a directory (recursive), a glob
+    pattern and/or a manifest file. Manifest lines are `path` or
+    `path<TAB>source_id`; blank lines and lines starting with # are skipped.
+    """
+    found: dict[Path, str | None] = {}
+    if directory:
+        for p in sorted(Path(directory).expanduser().rglob("*.pdf")):
+            found.setdefault(p.resolve(), None)
+    if pattern:
+        for p in sorted(glob.glob(str(Path(pattern).expanduser()), recursive=True)):
+            found.setdefault(Path(p).resolve(), None)
+    if manifest:
+        base = Path(manifest).expanduser().resolve().parent
+        for line in Path(manifest).expanduser().read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path, _, source_id = line.partition("\t")
+            found[(base / Path(path.strip()).expanduser()).resolve()] = source_id.strip() or None
+    return list(found.items())
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds else 0.0
+
+
+def _parse(path: str) -> tuple[int, list, float]:
+    # Runs in a worker process; returns (pages, chunks, seconds). Files are
+    # already spread over the pool, so pages are not parallelized again.
+    start = time.perf_counter()
+    stats = {}
+    chunks = list(iter_pdf_records(path, stats, workers=1))
+    return stats.get("pages", 0), chunks, time.perf_counter() - start
+
+
+def ingest_corpus(
+    files: list[tuple[Path, str | None]],
+    store,
+    workers: int | None = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    full: bool = False,
+    keywords=None,
+) -> tuple[int, list[FileReport], float]:
+    """
+    Parse and chunk PDFs in a process pool and feed every new or changed
+    chunk through one shared embedding/upsert pipeline. Returns (points
+    upserted, per-file reports, wall seconds). A KeywordIndex passed as
+    `keywords` is updated with every parsed chunk and saved at the end.
+    """
+    reports: list[FileReport] = []
+    trackers: list[tuple[FileReport, IncrementalSource]] = []
+    workers = workers or os.cpu_count() or 1
+
+    def points():
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            queue = iter(files)
+            # Keep only a couple of parsed documents per worker waiting on the
+            # embedding stage so memory stays bounded on huge corpora.
+            limit = 2 * workers
+
+            def submit_next():
+                for path, source_id in queue:
+                    report = FileReport(path=str(path), source=source_id or str(path))
+                    if not path.is_file():
+                        report.error = "not found"
+                        reports.append(report)
+                        continue
+                    futures[pool.submit(_parse, str(path))] = report
+                    return
+
+            for _ in range(limit):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    report = futures.pop(fut)
+                    submit_next()
+                    reports.append(report)
+                    try:
+                        report.pages, chunks, report.parse_seconds = fut.result()
+                    except Exception as exc:
+                        report.error = str(exc)
+                        logger.error("Failed to parse %s: %s", report.path, exc)
+                        continue
+                    report.chunks = len(chunks)
+                    logger.info(
+                        "Parsed %s: %s pages, %s chunks in %.2fs (%.1f pages/s, %.1f chunks/s)",
+                        report.path,
+                        report.pages,
+                        report.chunks,
+                        report.parse_seconds,
+                        _rate(report.pages, report.parse_seconds),
+                        _rate(report.chunks, report.parse_seconds),
+                    )
+                    tracker = IncrementalSource(store, report.source, reuse=not full, keywords=keywords)
+                    trackers.append((report, tracker))
+                    yield from tracker.filter(chunk_points(report.source, chunks))
+
+    start = time.perf_counter()
+    ingested = run_pipeline(points(), store, batch_size=batch_size, max_in_flight=max_in_flight)
+    # Only prune and record manifests once every upsert has landed, and
+    # publish the store once for the whole corpus before any manifest.
+    finished = [(report, tracker) for report, tracker in trackers if tracker.seen]
+    for report, tracker in trackers:
+        report.skipped = tracker.skipped
+    for report, tracker in finished:
+        report.deleted = tracker.prune()
+    store.save()
+    for _, tracker in finished:
+        tracker.record()
+    if keywords is not None:
+        keywords.save()
+    return ingested, reports, time.perf_counter() - start
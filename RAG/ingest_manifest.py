@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from data_loader import EMBED_MODEL
+from collection_version import record_source
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", ".ingest_manifests")
+
+
+def manifest_path(collection: str, source: str) -> Path:
+    name = hashlib.sha256(f"{collection}\0{source}".encode()).hexdigest()[:32]
+    return Path(MANIFEST_DIR) / collection / f"{name}.json"
+
+
+def load_manifest(collection: str, source: str) -> dict | None:
+    path = manifest_path(collection, source)
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text())
+
+
+def point_metadata(payload: dict) -> dict:
+    """Payload fields besides source and text, e.g. a chunk's page range."""
+    return {k: v for k, v in payload.items() if k not in ("source", "text")}
+
+
+def save_manifest(collection: str, source: str, ids: list[str], metadata: dict[str, dict] | None = None) -> None:
+    path = manifest_path(collection, source)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "collection": collection,
+        "source": source,
+        "model": EMBED_MODEL,
+        "updated_at": time.time(),
+        "ids": ids,
+        "metadata": metadata or {},
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+class IncrementalSource:
+    """
+    Tracks one source across a re-ingest. filter() passes through only
+    chunks whose content-hash id is not already stored; finish() then
+    deletes ids that disappeared, saves the store and records the new
+    manifest. With several sources on one store, call prune() on each, save
+    the store once, then record() each: a manifest is only written once the
+    points it lists are published.
+
+    Without a manifest (first run, or manifest dir lost) the known ids are
+    read back from Qdrant so stale points are still cleaned up.
+
+    An unchanged chunk can still move (e.g. to another page when text is
+    inserted above it). The manifest keeps each id's metadata, and finish()
+    rewrites the stored payload of reused ids whose metadata differs.
+
+    With a KeywordIndex, every chunk seen (unchanged ones included) is put
+    in it and finish() drops the source's removed chunks; the caller saves it.
+
+    finish() also records the source's content version, which is how the
+    server's answer cache learns that answers drawn from it are stale.
+    """
+
+    def __init__(self, store, source: str, reuse: bool = True, keywords=None):
+        self.store = store
+        self.source = source
+        self.keywords = keywords
+        self.seen: list[str] = []
+        self.metadata: dict[str, dict] = {}
+        self.moved: dict[str, dict] = {}
+        self.skipped = 0
+        self.deleted = 0
+        self.stored: dict[str, dict] = {}  # metadata as of the last ingest
+
+        manifest = load_manifest(store.collection, source)
+        if manifest is None:
+            # Old position-based ids never collide with content-hash ids, so
+            # they simply show up as stale and get deleted.
+            self.known = store.ids_for_source(source)
+            self.reusable = self.known
+        else:
+            self.known = set(manifest["ids"])
+            self.stored = manifest.get("metadata", {})
+            # Vectors from a different embedding model cannot be reused.
+            self.reusable = self.known if manifest.get("model") == EMBED_MODEL else set()
+        if not reuse:
+            self.reusable = set()
+
+    def filter(self, points: Iterable[tuple[str, dict]]) -> Iterator[tuple[str, dict]]:
+        seen = set()
+        for point_id, payload in points:
+            if point_id in seen:
+                continue
+            seen.add(point_id)
+            self.seen.append(point_id)
+            self.metadata[point_id] = point_metadata(payload)
+            if self.keywords is not None:
+                self.keywords.add(point_id, self.source, payload["text"])
+            if point_id in self.reusable:
+                self.skipped += 1
+                # Without a recorded entry (older manifest, or none) assume it moved.
+                if self.stored.get(point_id) != self.metadata[point_id]:
+                    self.moved[point_id] = self.metadata[point_id]
+                continue
+            yield point_id, payload
+
+    def prune(self) -> int:
+        """Delete removed chunks and update moved ones. Returns the number deleted."""
+        stale = list(self.known - set(self.seen))
+        if stale:
+            self.store.delete(stale)
+        moved = {i: m for i, m in self.moved.items() if m}
+        if moved:
+            self.store.set_payload(moved)
+        self.deleted = len(stale)
+        logger.info(
+            "%s: %s unchanged (%s moved), %s deleted", self.source, self.skipped, len(moved), len(stale)
+        )
+        return len(stale)
+
+    def record(self) -> None:
+        """Save the manifest and content version (after the store is saved)."""
+        save_manifest(self.store.collection, self.source, self.seen, self.metadata)
+        if record_source(self.store.collection, self.source, self.seen):
+            logger.info("%s: new content version recorded", self.source)
+        if self.keywords is not None:
+            self.keywords.retain(self.source, self.seen)
+
+    def finish(self) -> int:
+        """prune(), save the store, record(). Returns the number deleted."""
+        deleted = self.prune()
+        self.store.save()
+        self.record()
+        return deleted
@@ -0,0 +1,116 @@
+import logging
+import hashlib
+import random
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+import openai
+from qdrant_client.http.exceptions import ResponseHandlingException
+
+from data_loader import embed_texts
+
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = 64
+MAX_IN_FLIGHT = 4
+MAX_RETRIES = 5
+
+# Errors worth retrying; anything else (bad request, auth) fails the ingest.
+EMBED_RETRY_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+UPSERT_RETRY_ERRORS = (ResponseHandlingException,)
+
+
+def batched(iterable: Iterable, n: int) -> Iterator[list]:
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+def chunk_id(source: str, chunk: str) -> str:
+    # Content-addressed: an unchanged chunk keeps its id wherever it moves in the document.
+    digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{digest}"))
+
+
+def chunk_points(source: str, chunks: Iterable) -> Iterator[tuple[str, dict]]:
+    """
+    Turn a source's chunks into (point id, payload) pairs. Chunks are texts
+    or data_loader Chunk records, whose page range goes into the payload.
+    """
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            yield chunk_id(source, chunk), {"source": source, "text": chunk}
+        else:
+            yield chunk_id(source, chunk.text), {"source": source, "text": chunk.text, **chunk.metadata()}
+
+
+def with_retry(fn, *args, retry_on=(), retries: int = MAX_RETRIES, base_delay: float = 1.0):
+    """Call fn(*args), retrying `retry_on` errors with exponential backoff and jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except retry_on as exc:
+            if attempt == retries:
+                raise
+            delay = base_delay * 2 ** attempt + random.uniform(0, base_delay)
+            logger.warning("%s failed (%s), retrying in %.1fs", fn.__name__, exc, delay)
+            time.sleep(delay)
+
+
+def run_pipeline(
+    points: Iterable[tuple[str, dict]],
+    store,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> int:
+    """
+    Stream (id, payload) pairs through batched embedding and batched upserts.
+
+    Up to `max_in_flight` embedding requests run at once while the previous
+    batch is being upserted, so at most max_in_flight + 2 batches of vectors
+    are alive at any time regardless of document size. `payload["text"]` is
+    what gets embedded. Returns the number of points upserted.
+    """
+    def embed_batch(batch):
+        vectors = with_retry(embed_texts, [p["text"] for _, p in batch], retry_on=EMBED_RETRY_ERRORS)
+        return batch, vectors
+
+    def upsert_batch(batch, vectors):
+        ids = [i for i, _ in batch]
+        payloads = [p for _, p in batch]
+        with_retry(store.upsert, ids, vectors, payloads, retry_on=UPSERT_RETRY_ERRORS)
+        return len(batch)
+
+    total = 0
+    pending = deque()
+    upload = None
+
+    def drain_one():
+        nonlocal upload, total
+        batch, vectors = pending.popleft().result()
+        # One upsert in flight at a time keeps ordering simple and memory flat.
+        if upload is not None:
+            total += upload.result()
+        upload = uploader.submit(upsert_batch, batch, vectors)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as embedder, ThreadPoolExecutor(max_workers=1) as uploader:
+        for batch in batched(points, batch_size):
+            pending.append(embedder.submit(embed_batch, batch))
+            if len(pending) >= max_in_flight:
+                drain_one()
+        while pending:
+            drain_one()
+        if upload is not None:
+            total += upload.result()
+
+    return total
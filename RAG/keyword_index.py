@@ -0,0 +1,292 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# Where the BM25 index lives: KEYWORD_INDEX_DIR/<collection>/keywords.npz.
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", ".keyword_index")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant (the usual 60 from Cormack et al.).
+RRF_K = 60
+
+_WORD = re.compile(r"[a-z0-9]+")
+# A word then a number, matched on lowercased text: "eecs 482", "math-215a",
+# but also "fall 2024" or "room 101". Only used for tokens and known prefixes.
+_IDENT = re.compile(r"\b([a-z]{2,8})([\s\-]?)(\d{2,4}[a-z]?)\b")
+# Course codes as written: an uppercase subject then a number ("EECS 482",
+# "MATH-215a"), matched on the original text.
+_CODE = re.compile(r"\b([A-Z]{2,8})[\s\-]?(\d{2,4}[A-Za-z]?)\b")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or tell that the "
+    "this to was what when where which who why will with you your about any there their".split()
+)
+
+
+def identifiers(text: str, prefixes=frozenset()) -> list[str]:
+    """
+    Identifier tokens ("eecs482") for the course codes in text, in order:
+    uppercase ones ("EECS 482"), plus lowercase ones ("eecs 482") whose
+    subject is in `prefixes`. "May 15" or "fall 2024" are not identifiers.
+    """
+    found = [(m.start(), (a + n).lower()) for m in _CODE.finditer(text) for a, n in [m.groups()]]
+    if prefixes:
+        found += [(m.start(), m[1] + m[3]) for m in _IDENT.finditer(text.lower()) if m[1] in prefixes and m[1] not in STOPWORDS]
+    return list(dict.fromkeys(token for _, token in sorted(found)))
+
+
+def subject(token: str) -> str:
+    """The subject prefix of an identifier token: "eecs482" -> "eecs"."""
+    return re.match(r"[a-z]+", token)[0]
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased words minus stopwords, plus one joined token per spaced
+    identifier, so "EECS 482" matches "eecs482" and vice versa.
+    """
+    low = text.lower()
+    tokens = [w for w in _WORD.findall(low) if w not in STOPWORDS]
+    tokens += [a + n for a, sep, n in _IDENT.findall(low) if sep and a not in STOPWORDS]
+    return tokens
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over the same chunks as the vector collection.
+
+    The ingest CLI fills it through IncrementalSource (add/retain) and
+    save()s it next to the collection; the server only loads and searches.
+    Postings are stored CSR-style (term offsets into doc ids and term
+    frequencies) in one .npz together with the chunk texts, so a keyword
+    hit needs no vector-store round trip.
+    """
+
+    def __init__(self, collection: str, path=None):
+        self.collection = collection
+        self.file = Path(path or KEYWORD_INDEX_DIR) / collection / "keywords.npz"
+        self._loaded_mtime = None
+        self._docs: dict[str, tuple[str, str]] = {}  # ingest side: point id -> (source, text)
+        self._load()
+
+    # -- persistence ---------------------------------------------------------
+
+    def _load(self):
+        self.ids, self.sources, self.texts = [], [], []
+        self.vocab: dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.avgdl = 1.0
+        # Subjects of the course codes in the corpus ("eecs"), so a question
+        # typed in lowercase can still name one.
+        self.prefixes: frozenset[str] = frozenset()
+        if not self.file.is_file():
+            return
+        with np.load(self.file, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes())
+            self.offsets = data["offsets"]
+            self.doc_ids = data["doc_ids"]
+            self.tfs = data["tfs"]
+            self.doc_len = data["doc_len"]
+        self.ids, self.sources, self.texts = meta["ids"], meta["sources"], meta["texts"]
+        self.vocab = {t: i for i, t in enumerate(meta["terms"])}
+        self.prefixes = frozenset(meta.get("prefixes", ()))
+        self.avgdl = max(float(self.doc_len.mean()), 1.0) if len(self.doc_len) else 1.0
+        self._loaded_mtime = self.file.stat().st_mtime_ns
+
+    def stale(self) -> bool:
+        """Whether the ingest CLI rewrote the index since it was loaded."""
+        try:
+            return self.file.stat().st_mtime_ns != self._loaded_mtime
+        except FileNotFoundError:
+            return False
+
+    def refresh(self):
+        """Reload if the ingest CLI rewrote the index."""
+        if self.stale():
+            self._load()
+
+    # -- ingest side ---------------------------------------------------------
+
+    def _ensure_docs(self):
+        if not self._docs and self.ids:
+            self._docs = {i: (s, t) for i, s, t in zip(self.ids, self.sources, self.texts)}
+
+    def add(self, point_id: str, source: str, text: str):
+        self._ensure_docs()
+        self._docs[point_id] = (source, text)
+
+    def retain(self, source: str, ids):
+        """Drop the source's chunks that are not in `ids`."""
+        self._ensure_docs()
+        keep = set(ids)
+        for point_id in [i for i, (s, _) in self._docs.items() if s == source and i not in keep]:
+            del self._docs[point_id]
+
+    def save(self):
+        """Rebuild the postings from the current chunks and write them atomically."""
+        self._ensure_docs()
+        ids = list(self._docs)
+        postings: dict[str, list[tuple[int, int]]] = {}
+        doc_len = np.zeros(len(ids), dtype=np.float32)
+        for row, point_id in enumerate(ids):
+            counts = Counter(tokenize(self._docs[point_id][1]))
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        terms = sorted(postings)
+        sizes = np.array([len(postings[t]) for t in terms], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        flat = [p for t in terms for p in postings[t]]
+        doc_ids = np.array([d for d, _ in flat], dtype=np.int32)
+        tfs = np.minimum(np.array([tf for _, tf in flat], dtype=np.int64), 65535).astype(np.uint16)
+        meta = {
+            "ids": ids,
+            "sources": [self._docs[i][0] for i in ids],
+            "texts": [self._docs[i][1] for i in ids],
+            "terms": terms,
+            "prefixes": sorted({subject(t) for i in ids for t in identifiers(self._docs[i][1])}),
+        }
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.file.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            offsets=offsets, doc_ids=doc_ids, tfs=tfs, doc_len=doc_len,
+        )
+        os.replace(tmp, self.file)
+        self._load()
+        self._docs = {}
+
+    # -- search side ---------------------------------------------------------
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _postings(self, term):
+        j = self.vocab.get(term)
+        if j is None:
+            return None
+        lo, hi = self.offsets[j], self.offsets[j + 1]
+        return self.doc_ids[lo:hi], self.tfs[lo:hi]
+
+    def scores(self, query: str) -> np.ndarray:
+        out = np.zeros(len(self.ids), dtype=np.float32)
+        n = len(self.ids)
+        for term in set(tokenize(query)):
+            hit = self._postings(term)
+            if hit is None:
+                continue
+            docs, tf = hit
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = tf.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / self.avgdl)
+            out[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return out
+
+    def _source_mask(self, source):
+        if source is None:
+            return None
+        wanted = {source} if isinstance(source, str) else set(source)
+        return np.fromiter((s in wanted for s in self.sources), dtype=bool, count=len(self.sources))
+
+    def _top(self, scores, top_k, mask=None) -> list[tuple[int, float]]:
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        hits = hits[np.argsort(-scores[hits], kind="stable")[:top_k]]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def search(self, query: str, top_k: int = 20, source=None) -> list[tuple[int, float]]:
+        """(row, BM25 score) pairs, best first."""
+        if not self.ids:
+            return []
+        return self._top(self.scores(query), top_k, self._source_mask(source))
+
+    def exact(self, query: str, top_k: int = 20, source=None) -> list[tuple[int, float]]:
+        """
+        Chunks containing every course code in the query, ranked by BM25 on
+        the whole query. Empty unless the query has a code (see
+        identifiers()) and some chunk writes each one as a code: that is the
+        high-confidence case where the dense search (and its embedding
+        call) can be skipped. Anything else goes to hybrid search.
+        """
+        idents = set(identifiers(query, self.prefixes))
+        if not idents or not self.ids:
+            return []
+        mask = self._source_mask(source)
+        if mask is None:
+            mask = np.ones(len(self.ids), dtype=bool)
+        for term in idents:
+            hit = self._postings(term)
+            if hit is None:
+                return []
+            has = np.zeros(len(self.ids), dtype=bool)
+            has[hit[0]] = True
+            mask &= has
+        # The joined token also comes from "fall 2024"-style text; keep
+        # only chunks where each identifier appears as a code.
+        codes = [self._code_pattern(token) for token in idents]
+        for row in np.flatnonzero(mask):
+            if not all(code.search(self.texts[row]) for code in codes):
+                mask[row] = False
+        if not mask.any():
+            return []
+        return self._top(self.scores(query), top_k, mask)
+
+    def _code_pattern(self, token: str) -> re.Pattern:
+        """Matches `token` written as identifiers() would recognize it."""
+        prefix = subject(token)
+        forms = [prefix.upper()] + ([prefix] if prefix in self.prefixes else [])
+        return re.compile(rf"\b(?:{'|'.join(forms)})[\s\-]?(?i:{re.escape(token[len(prefix):])})\b")
+
+    def result(self, hits) -> dict:
+        """Rows from search()/exact() in the vector stores' search-result shape."""
+        rows = [i for i, _ in hits]
+        return {
+            "contexts": [self.texts[i] for i in rows],
+            "sources": list(dict.fromkeys(self.sources[i] for i in rows)),
+            "scores": [s for _, s in hits],
+            "context_sources": [self.sources[i] for i in rows],
+        }
+
+
+def fuse_rrf(dense: dict, sparse: dict, k: int = RRF_K) -> dict:
+    """
+    Reciprocal rank fusion of a dense and a keyword result (same shape as a
+    store search). Order follows the fused rank; "relevance" holds the fused
+    score scaled to the best possible (rank 1 in both lists), while "scores"
+    keep the dense cosine so thresholds tuned on it still apply. Chunks only
+    the keyword side found get the lowest dense score returned, an upper
+    bound for anything the dense search left out.
+    """
+    fused: dict[tuple[str, str], dict] = {}
+    floor = min(dense["scores"], default=0.0)
+    dense_sources = dense.get("context_sources") or [""] * len(dense["contexts"])
+    vectors = dense.get("vectors") or [None] * len(dense["contexts"])
+    for rank, (text, source, score, vector) in enumerate(zip(dense["contexts"], dense_sources, dense["scores"], vectors)):
+        fused[(source, text)] = {"rrf": 1 / (k + rank + 1), "score": score, "vector": vector}
+    for rank, (text, source) in enumerate(zip(sparse["contexts"], sparse["context_sources"])):
+        item = fused.setdefault((source, text), {"rrf": 0.0, "score": floor, "vector": None})
+        item["rrf"] += 1 / (k + rank + 1)
+
+    order = sorted(fused.items(), key=lambda kv: -kv[1]["rrf"])
+    best = 2 / (k + 1)
+    result = {
+        "contexts": [text for (_, text), _ in order],
+        "sources": list(dict.fromkeys(source for (source, _), _ in order)),
+        "scores": [item["score"] for _, item in order],
+        "context_sources": [source for (source, _), _ in order],
+        "relevance": [item["rrf"] / best for _, item in order],
+    }
+    if any(item["vector"] is not None for _, item in order):
+        result["vectors"] = [item["vector"] for _, item in order]
+    return result
@@ -1,12 +1,15 @@
 import argparse
 import logging
-import uuid
 from pathlib import Path
 
 from dotenv import load_dotenv
 
-from data_loader import load_and_chunk_pdf, embed_texts
-from vector_db import QDrantStorage
+from data_loader import iter_pdf_records
+from vector_db import get_storage
+from ingest_pipeline import run_pipeline, chunk_points, EMBED_BATCH_SIZE, MAX_IN_FLIGHT
+from ingest_corpus import discover_pdfs, ingest_corpus
+from ingest_manifest import IncrementalSource
+from keyword_index import KeywordIndex
 from custom_types import RagUpsertResult
 
 
@@ -15,56 +18,139 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+def _store_kwargs(qdrant_url, collection) -> dict:
+    store_kwargs = {}
+    if qdrant_url:
+        store_kwargs["url"] = qdrant_url
+    if collection:
+        store_kwargs["collection"] = collection
+    return store_kwargs
+
+
 def ingest_pdf(
     pdf_path,
     source_id,
     qdrant_url,
     collection,
+    batch_size=EMBED_BATCH_SIZE,
+    max_in_flight=MAX_IN_FLIGHT,
+    full=False,
 ) -> RagUpsertResult:
-    """Load, chunk, embed, and upsert a PDF into Qdrant."""
+    """
+    Load, chunk, embed, and upsert a PDF into Qdrant in bounded-memory batches.
+    Only chunks that are new since the last ingest of this source are embedded
+    (unless `full`), and chunks that disappeared are deleted.
+    """
     path = Path(pdf_path).expanduser().resolve()
     if not path.is_file():
         raise FileNotFoundError(f"PDF not found: {path}")
 
     source = source_id or str(path)
-    logger.info("Loading and chunking PDF: %s", path)
-    chunks = load_and_chunk_pdf(str(path))
-    if not chunks:
+    store_kwargs = _store_kwargs(qdrant_url, collection)
+
+    logger.info(
+        "Streaming %s into Qdrant (url=%s, collection=%s, batch_size=%s, max_in_flight=%s)",
+        path,
+        store_kwargs.get("url", "http://localhost:6333"),
+        store_kwargs.get("collection", "docs3"),
+        batch_size,
+        max_in_flight,
+    )
+    store = get_storage(**store_kwargs)
+    keywords = KeywordIndex(store.collection)
+    tracker = IncrementalSource(store, source, reuse=not full, keywords=keywords)
+    ingested = run_pipeline(
+        tracker.filter(chunk_points(source, iter_pdf_records(str(path)))),
+        store,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+    )
+    if not tracker.seen:
         raise ValueError(f"No text chunks produced from {path}")
+    deleted = tracker.finish()
+    keywords.save()
+    logger.info("Keyword index: %s chunks in %s", len(keywords), keywords.file)
 
-    logger.info("Embedding %s chunks", len(chunks))
-    vectors = embed_texts(chunks)
+    return RagUpsertResult(ingested=ingested, skipped=tracker.skipped, deleted=deleted)
 
-    ids = [
-        str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{i}"))
-        for i in range(len(chunks))
-    ]
-    payloads = [{"source": source, "text": chunks[i]} for i in range(len(chunks))]
 
-    store_kwargs = {}
-    if qdrant_url:
-        store_kwargs["url"] = qdrant_url
-    if collection:
-        store_kwargs["collection"] = collection
+def ingest_many(
+    files,
+    qdrant_url,
+    collection,
+    workers=None,
+    batch_size=EMBED_BATCH_SIZE,
+    max_in_flight=MAX_IN_FLIGHT,
+    full=False,
+) -> RagUpsertResult:
+    """Parse PDFs in a process pool and ingest them through one shared embed/upsert stage."""
+    if not files:
+        raise ValueError("No PDFs matched")
+
+    logger.info("Ingesting %s PDFs with %s parse workers", len(files), workers or "cpu_count")
+    store = get_storage(**_store_kwargs(qdrant_url, collection))
+    keywords = KeywordIndex(store.collection)
+    ingested, reports, seconds = ingest_corpus(
+        files,
+        store,
+        workers=workers,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        full=full,
+        keywords=keywords,
+    )
+    logger.info("Keyword index: %s chunks in %s", len(keywords), keywords.file)
 
+    failed = [r for r in reports if r.error]
+    for r in failed:
+        logger.warning("Skipped %s: %s", r.path, r.error)
+    pages = sum(r.pages for r in reports)
+    chunks = sum(r.chunks for r in reports)
     logger.info(
-        "Upserting into Qdrant (url=%s, collection=%s)",
-        store_kwargs.get("url", "http://localhost:6333"),
-        store_kwargs.get("collection", "docs3"),
+        "Corpus done: %s files (%s failed), %s pages, %s chunks (%s embedded) in %.2fs "
+        "(%.1f pages/s, %.1f chunks/s end to end)",
+        len(reports),
+        len(failed),
+        pages,
+        chunks,
+        ingested,
+        seconds,
+        pages / seconds if seconds else 0.0,
+        chunks / seconds if seconds else 0.0,
+    )
+    return RagUpsertResult(
+        ingested=ingested,
+        skipped=sum(r.skipped for r in reports),
+        deleted=sum(r.deleted for r in reports),
     )
-    QDrantStorage(**store_kwargs).upsert(ids, vectors, payloads)
-
-    return RagUpsertResult(ingested=len(chunks))
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
-        description="Ingest a PDF into Qdrant without Inngest."
+        description="Ingest a PDF, or a whole corpus of PDFs, into Qdrant without Inngest."
+    )
+    parser.add_argument("pdf_path", nargs="?", help="Path to the PDF to ingest")
+    parser.add_argument(
+        "--dir",
+        help="Ingest every *.pdf under this directory (recursive)",
+    )
+    parser.add_argument(
+        "--glob",
+        help="Ingest every PDF matching this glob pattern (supports **)",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="File listing PDFs to ingest, one `path` or `path<TAB>source_id` per line",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes used to parse and chunk PDFs in corpus mode (default: CPU count)",
     )
-    parser.add_argument("pdf_path", help="Path to the PDF to ingest")
     parser.add_argument(
         "--source-id",
-        help="Optional source identifier stored with each chunk (defaults to PDF path)",
+        help="Optional source identifier stored with each chunk (defaults to PDF path, single-file mode only)",
     )
     parser.add_argument(
         "--qdrant-url",
@@ -76,6 +162,28 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Qdrant collection name (default: docs3)",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help=f"Chunks per embedding request and upsert (default: {EMBED_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help=f"Embedding requests running concurrently (default: {MAX_IN_FLIGHT})",
+    )
+    parser.add_argument(
+        "--apply-profile",
+        action="store_true",
+        help="Apply the QDRANT_* collection profile (quantization, HNSW, source index) to an existing collection first",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every chunk instead of only new or changed ones",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -88,6 +196,9 @@ def build_parser() -> argparse.ArgumentParser:
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
+    corpus_mode = bool(args.dir or args.glob or args.manifest)
+    if not corpus_mode and not args.pdf_path:
+        parser.error("pass a pdf_path or one of --dir/--glob/--manifest")
 
     logging.basicConfig(
         level=getattr(logging, args.log_level.upper(), logging.INFO),
@@ -95,13 +206,41 @@ def main() -> None:
     )
 
     try:
-        result = ingest_pdf(
-            pdf_path=args.pdf_path,
-            source_id=args.source_id,
-            qdrant_url=args.qdrant_url,
-            collection=args.collection,
+        if args.apply_profile:
+            store = get_storage(**_store_kwargs(args.qdrant_url, args.collection))
+            if not hasattr(store, "apply_profile"):
+                raise ValueError("--apply-profile only applies to the qdrant backend")
+            logger.info("Applying collection profile: %s", store.profile)
+            store.apply_profile()
+        if corpus_mode:
+            files = discover_pdfs(args.dir, args.glob, args.manifest)
+            if args.pdf_path:
+                files.append((Path(args.pdf_path).expanduser().resolve(), args.source_id))
+            result = ingest_many(
+                files,
+                qdrant_url=args.qdrant_url,
+                collection=args.collection,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                max_in_flight=args.max_in_flight,
+                full=args.full,
+            )
+        else:
+            result = ingest_pdf(
+                pdf_path=args.pdf_path,
+                source_id=args.source_id,
+                qdrant_url=args.qdrant_url,
+                collection=args.collection,
+                batch_size=args.batch_size,
+                max_in_flight=args.max_in_flight,
+                full=args.full,
+            )
+        logger.info(
+            "Ingest complete. %s chunks inserted, %s unchanged, %s deleted.",
+            result.ingested,
+            result.skipped,
+            result.deleted,
         )
-        logger.info("Ingest complete. %s chunks inserted.", result.ingested)
     except Exception as exc:
         logger.error("Ingest failed: %s", exc)
         raise SystemExit(1) from exc
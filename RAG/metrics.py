@@ -0,0 +1,125 @@
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from AGENTS.admission import LIMITERS
+
+log = logging.getLogger("uvicorn.error")
+
+# Fixed points of a turn, in the order they normally happen. Every value is
+# seconds since STT end-of-turn; stages a turn never reached are left out.
+STAGES = (
+    "stt_end",          # AssemblyAI end_of_turn received (t=0)
+    "answer_cache",     # answer found in the answer cache (no LLM, retrieval or TTS)
+    "llm_phase1",       # first LLM reply of the turn, before any retrieval
+    "embedding",        # query embedding ready (cache hit or OpenAI)
+    "search",           # vector search returned
+    "llm_phase2",       # LLM reply written with retrieved context
+    "tts_first_byte",   # first TTS PCM (or cached phrase audio) for the turn
+    "first_frame",      # first μ-law frame sent to Twilio
+    "last_frame",       # last μ-law frame sent to Twilio
+)
+
+TURN_STAGE_SECONDS = Histogram(
+    "voice_turn_stage_seconds",
+    "Seconds from STT end-of-turn to each turn stage",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0),
+)
+PROMPT_TOKENS = Histogram(
+    "voice_llm_prompt_tokens",
+    "Estimated prompt tokens per LLM call, after conversation memory compaction",
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+RETRIEVALS = Counter(
+    "voice_retrievals",
+    "RAG searches by path: exact (keyword index only, no embedding), hybrid (dense + BM25) or dense",
+    ["path"],
+)
+CALL_SETUP_SECONDS = Histogram(
+    "voice_call_setup_seconds",
+    "Seconds from accepting the Twilio WebSocket to the STT stream being open",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+STT_SESSIONS = Counter(
+    "voice_stt_sessions",
+    "AssemblyAI sessions handed to calls, by source: pool (pre-opened) or direct (opened by the call)",
+    ["source"],
+)
+ANSWER_CACHE_LOOKUPS = Counter(
+    "voice_answer_cache_lookups",
+    "Answer cache lookups per turn: hit, miss, error (question embedding failed), "
+    "or skipped (cache off or question not self-contained)",
+    ["result"],
+)
+TURNS_INTERRUPTED = Counter("voice_turns_interrupted", "Turns cancelled by barge-in or a newer turn")
+ACTIVE_CALLS = Gauge("voice_active_calls", "Twilio media streams currently connected")
+TTS_QUEUE_DEPTH = Gauge("voice_tts_queue_depth", "PCM chunks waiting in Agent.queue, summed over active calls")
+TTS_QUEUE_DEPTH_MAX = Gauge("voice_tts_queue_depth_max", "Deepest Agent.queue among active calls")
+
+_agents = weakref.WeakSet()
+TTS_QUEUE_DEPTH.set_function(lambda: sum(a.queue.qsize() for a in list(_agents)))
+TTS_QUEUE_DEPTH_MAX.set_function(lambda: max((a.queue.qsize() for a in list(_agents)), default=0))
+
+
+class _AdmissionCollector:
+    """Exports the AGENTS.admission limiters' counts at scrape time."""
+
+    def collect(self):
+        active = GaugeMetricFamily("voice_limit_active", "Calls or upstream requests holding a slot", labels=["limit"])
+        waiting = GaugeMetricFamily("voice_limit_waiting", "Calls or upstream requests queued for a slot", labels=["limit"])
+        rejected = CounterMetricFamily(
+            "voice_limit_rejected", "Calls or upstream requests shed by admission control", labels=["limit"]
+        )
+        for limiter in LIMITERS:
+            active.add_metric([limiter.name], limiter.active)
+            waiting.add_metric([limiter.name], limiter.waiting)
+            rejected.add_metric([limiter.name], limiter.rejected)
+        yield from (active, waiting, rejected)
+
+
+REGISTRY.register(_AdmissionCollector())
+
+
+@asynccontextmanager
+async def track_call(agent):
+    """Count the call as active and expose its Agent.queue to the gauges."""
+    ACTIVE_CALLS.inc()
+    _agents.add(agent)
+    try:
+        yield
+    finally:
+        _agents.discard(agent)
+        ACTIVE_CALLS.dec()
+
+
+class TurnTimeline:
+    """
+    Timestamps one conversational turn. Created when AssemblyAI reports end
+    of turn; mark() records the first time each stage is reached (or the
+    latest, with last=True). finish() exports the stages to the histogram
+    and writes one trace line for the call.
+    """
+
+    def __init__(self, call_id: str, turn: int):
+        self.call_id = call_id
+        self.turn = turn
+        self.t0 = time.monotonic()
+        self.marks = {"stt_end": 0.0}
+
+    def mark(self, stage: str, last: bool = False) -> None:
+        if last or stage not in self.marks:
+            self.marks[stage] = time.monotonic() - self.t0
+
+    def finish(self, interrupted: bool = False) -> None:
+        for stage in STAGES:
+            if stage in self.marks:
+                TURN_STAGE_SECONDS.labels(stage).observe(self.marks[stage])
+        if interrupted:
+            TURNS_INTERRUPTED.inc()
+        trace = " ".join(f"{s}={self.marks[s] * 1000:.0f}ms" for s in STAGES if s in self.marks)
+        log.info("turn call=%s n=%d%s %s", self.call_id, self.turn, " interrupted" if interrupted else "", trace)
@@ -0,0 +1,208 @@
+import importlib.util
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+from pypdf import PdfReader
+
+# Files with at least this many pages have their text extracted in a process pool.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+PAGES_PER_TASK = 16
+
+# Sentence ends (with any closing quote/bracket) or line breaks, plus the
+# whitespace after them: each piece keeps its separator, so joining pieces
+# reproduces the page text exactly.
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*")
+_WORD = re.compile(r"\S+\s*")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    page_start: int  # 1-based, inclusive
+    page_end: int
+
+    def metadata(self) -> dict:
+        return {"page_start": self.page_start, "page_end": self.page_end}
+
+
+def _encoding():
+    """
+    cl100k_base, the tokenizer SentenceSplitter counts with. tiktoken fetches
+    encodings on first use, so point it at the copy llama_index ships when
+    no cache is configured (offline ingest hosts).
+    """
+    import tiktoken
+
+    if "TIKTOKEN_CACHE_DIR" not in os.environ:
+        spec = importlib.util.find_spec("llama_index.core")
+        if spec is not None and spec.submodule_search_locations:
+            cache = Path(list(spec.submodule_search_locations)[0]) / "_static" / "tiktoken_cache"
+            if cache.is_dir():
+                os.environ["TIKTOKEN_CACHE_DIR"] = str(cache)
+                try:
+                    return tiktoken.get_encoding("cl100k_base")
+                finally:
+                    del os.environ["TIKTOKEN_CACHE_DIR"]
+    return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenSplitter:
+    """
+    Streaming splitter with SentenceSplitter's size semantics: chunks of at
+    most `chunk_size` tokens, consecutive chunks sharing up to
+    `chunk_overlap` tokens of whole sentences. Text is fed page by page and
+    a chunk may span pages; each chunk records the pages it came from.
+
+    Each page is tokenized once (pieces are counted by token offsets)
+    instead of re-tokenizing candidate chunks, and over-long sentences fall
+    back to word boundaries.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, encoding=None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._enc = encoding or _encoding()
+        self._cur: list[tuple[str, int, int]] = []  # (text, tokens, page)
+        self._cur_tokens = 0
+        self._fresh = 0  # pieces added since the last chunk was emitted
+
+    def _count(self, pieces: list[str]) -> list[int]:
+        return [len(t) for t in self._enc.encode_ordinary_batch(pieces)]
+
+    def _pieces(self, text: str) -> Iterator[tuple[str, int]]:
+        # Tokenize the page once and attribute each token to the piece it
+        # starts in, rather than encoding every (often one-word) piece.
+        _, starts = self._enc.decode_with_offsets(self._enc.encode_ordinary(text))
+        ends = [m.end() for m in _BOUNDARY.finditer(text)]
+        if not ends or ends[-1] < len(text):
+            ends.append(len(text))
+        before = 0
+        prev = 0
+        for end, upto in zip(ends, np.searchsorted(starts, ends).tolist()):
+            piece, tokens = text[prev:end], upto - before
+            prev, before = end, upto
+            if not piece:
+                continue
+            if tokens <= self.chunk_size:
+                yield piece, tokens
+                continue
+            words = _WORD.findall(piece)
+            for word, n in zip(words, self._count(words)):
+                if n <= self.chunk_size:
+                    yield word, n
+                else:
+                    # No whitespace to split on: cut by characters (~4 per token).
+                    step = self.chunk_size * 2
+                    for i in range(0, len(word), step):
+                        yield word[i:i + step], self._count([word[i:i + step]])[0]
+
+    def _emit(self) -> Chunk | None:
+        text = "".join(t for t, _, _ in self._cur).strip()
+        # Pages that only contributed whitespace (blank pages, separators)
+        # are not part of the chunk's page range.
+        pages = [page for t, _, page in self._cur if not t.isspace()]
+        chunk = Chunk(text, pages[0], pages[-1]) if text else None
+        # Carry the trailing pieces that fit in chunk_overlap into the next chunk.
+        keep, tokens = 0, 0
+        for _, n, _ in reversed(self._cur):
+            if tokens + n > self.chunk_overlap:
+                break
+            tokens += n
+            keep += 1
+        self._cur = self._cur[len(self._cur) - keep:] if keep else []
+        self._cur_tokens = tokens
+        self._fresh = 0
+        return chunk
+
+    def feed(self, text: str, page: int) -> Iterator[Chunk]:
+        if text and not text[-1].isspace():
+            text += "\n"  # keep the last word of a page off the next page's first
+        for piece, n in self._pieces(text):
+            if self._fresh and self._cur_tokens + n > self.chunk_size:
+                chunk = self._emit()
+                if chunk is not None:
+                    yield chunk
+                # The carried overlap must leave room for this piece.
+                while self._cur and self._cur_tokens + n > self.chunk_size:
+                    self._cur_tokens -= self._cur.pop(0)[1]
+            self._cur.append((piece, n, page))
+            self._cur_tokens += n
+            self._fresh += 1
+
+    def flush(self) -> Iterator[Chunk]:
+        if self._fresh:
+            chunk = self._emit()
+            if chunk is not None:
+                yield chunk
+        self._cur, self._cur_tokens, self._fresh = [], 0, 0
+
+    def split_pages(self, pages: Iterable[tuple[int, str]]) -> Iterator[Chunk]:
+        for page, text in pages:
+            yield from self.feed(text, page)
+        yield from self.flush()
+
+
+_reader: PdfReader | None = None
+
+
+def _open(path: str):
+    global _reader
+    _reader = PdfReader(path)
+
+
+def _extract(start: int, stop: int) -> list[str]:
+    # Runs in a pool worker that opened the file once in _open().
+    return [_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pages(path: str, stats: dict | None = None, workers: int | None = None) -> Iterator[tuple[int, str]]:
+    """
+    Yield (page number, text) lazily, in order. Files with at least
+    PDF_PARALLEL_MIN_PAGES pages are extracted PAGES_PER_TASK pages at a
+    time by `workers` processes (default PDF_PARSE_WORKERS), keeping at most
+    2 x workers tasks submitted ahead of the consumer.
+    """
+    reader = PdfReader(path)
+    n = len(reader.pages)
+    if stats is not None:
+        stats["pages"] = n
+    workers = workers or PDF_PARSE_WORKERS
+    if workers <= 1 or n < PDF_PARALLEL_MIN_PAGES:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+        return
+
+    # Only about two tasks per worker are in flight, so a slow consumer
+    # (embedding, upserts) never has the whole file's text waiting on it.
+    starts = iter(range(0, n, PAGES_PER_TASK))
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open, initargs=(path,)) as pool:
+        def submit():
+            start = next(starts, None)
+            if start is not None:
+                pending.append((start, pool.submit(_extract, start, min(start + PAGES_PER_TASK, n))))
+
+        for _ in range(2 * workers):
+            submit()
+        while pending:
+            start, future = pending.popleft()
+            texts = future.result()
+            submit()
+            for j, text in enumerate(texts):
+                yield start + j + 1, text
+
+
+def iter_chunks(path: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+                stats: dict | None = None, workers: int | None = None) -> Iterator[Chunk]:
+    """Parse and split a PDF as a stream; pages are never all held at once."""
+    splitter = TokenSplitter(chunk_size, chunk_overlap)
+    yield from splitter.split_pages(iter_pages(path, stats, workers))
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import httpx
+from openai import AsyncOpenAI
+from .embeddings import EMBED_MODEL, EMBED_DIM
+from .vector_db import get_async_storage
+from .embedding_cache import EmbeddingCache
+from .context_packing import RAG_PACKING, RAG_FETCH_K, pack_context
+from .keyword_index import KeywordIndex, fuse_rrf
+from .metrics import RETRIEVALS
+from AGENTS.admission import embed_requests
+
+log = logging.getLogger("uvicorn.error")
+
+# One pooled HTTP client is shared by every call on this worker, so size the
+# pool for the number of concurrent RAG turns you expect.
+EMBED_MAX_CONNECTIONS = int(os.getenv("EMBED_MAX_CONNECTIONS", "32"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+# Optional SQLite file so cached query embeddings survive restarts.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH") or None
+
+# Use the ingest-built BM25 index (if there is one) for hybrid search, and
+# answer queries with a known exact identifier from it without embedding.
+KEYWORD_SEARCH = os.getenv("KEYWORD_SEARCH", "1").lower() in ("1", "true", "yes")
+KEYWORD_EXACT = os.getenv("KEYWORD_EXACT", "1").lower() in ("1", "true", "yes")
+
+
+class Retriever:
+    """
+    Process-wide async retrieval layer: one pooled AsyncOpenAI client for
+    embeddings, one async vector store (Qdrant or the in-process NumPy
+    index, per VECTOR_BACKEND) for search, and the collection's keyword
+    index when ingest built one.
+    Create it once, call start() at app startup and close() at shutdown.
+    """
+
+    def __init__(self, url=None, collection=None):
+        self._url = url
+        self._collection = collection
+        self.embed_client: AsyncOpenAI | None = None
+        self.store = None
+        self.cache: EmbeddingCache | None = None
+        self.keywords: KeywordIndex | None = None
+        self._keywords_reload: asyncio.Task | None = None
+
+    async def start(self):
+        self.cache = EmbeddingCache(EMBED_CACHE_SIZE, EMBED_CACHE_TTL, EMBED_CACHE_PATH)
+        await self.cache.start()
+        self.embed_client = AsyncOpenAI(
+            timeout=EMBED_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=EMBED_MAX_CONNECTIONS,
+                    max_keepalive_connections=EMBED_MAX_CONNECTIONS,
+                ),
+                timeout=EMBED_TIMEOUT,
+            ),
+        )
+        self.store = get_async_storage(self._url, self._collection, dim=EMBED_DIM)
+        # The collection is checked once here instead of on every turn.
+        await self.store.ensure_collection()
+        if KEYWORD_SEARCH:
+            # Stays empty until ingest writes one; search() picks it up then.
+            self.keywords = await asyncio.to_thread(KeywordIndex, self.store.collection)
+
+    async def close(self):
+        if self._keywords_reload is not None:
+            self._keywords_reload.cancel()
+        if self.embed_client is not None:
+            await self.embed_client.close()
+        if self.store is not None:
+            await self.store.close()
+        if self.cache is not None:
+            await self.cache.close()
+
+    def _check_keywords(self):
+        """
+        Start reloading the keyword index in a worker thread if ingest
+        rewrote it. Turns keep searching the loaded index until the new one
+        replaces it in a single assignment.
+        """
+        if self.keywords is not None and self._keywords_reload is None and self.keywords.stale():
+            self._keywords_reload = asyncio.create_task(self._reload_keywords(self.keywords.collection))
+
+    async def _reload_keywords(self, collection: str):
+        try:
+            self.keywords = await asyncio.to_thread(KeywordIndex, collection)
+        except Exception as e:
+            # Still stale, so the next turn tries again.
+            log.warning("Keyword index reload failed: %s", e)
+        finally:
+            self._keywords_reload = None
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        async with embed_requests.slot():
+            response = await self.embed_client.embeddings.create(
+                model=EMBED_MODEL,
+                input=texts,
+            )
+        return [item.embedding for item in response.data]
+
+    async def embed_query(self, question: str) -> list[float]:
+        vector = await self.cache.get(question, EMBED_MODEL)
+        if vector is None:
+            vector = (await self.embed_texts([question]))[0]
+            self.cache.put(question, EMBED_MODEL, vector)
+        return vector
+
+    async def search(self, question: str, top_k: int = 5, source=None, timeline=None) -> dict:
+        """
+        With RAG_PACKING (default) at least RAG_FETCH_K candidates are fetched
+        and packed into RAG_CONTEXT_TOKENS (see context_packing); top_k is then
+        only a floor on the candidates, not the number of contexts returned.
+
+        With a keyword index, a question naming identifiers that the index
+        knows (e.g. "EECS 482") is answered from it alone, with no embedding
+        call; its scores are then 1.0. Other questions fuse dense and BM25
+        rankings with reciprocal rank fusion.
+        """
+        fetch_k = max(top_k, RAG_FETCH_K) if RAG_PACKING else top_k
+        self._check_keywords()
+        keywords = self.keywords
+        if keywords is not None:
+            hits = keywords.exact(question, fetch_k, source) if KEYWORD_EXACT else []
+            if hits:
+                found = keywords.result(hits)
+                found["relevance"] = [score / hits[0][1] for _, score in hits]
+                found["scores"] = [1.0] * len(hits)
+                if timeline is not None:
+                    timeline.mark("search")
+                RETRIEVALS.labels("exact").inc()
+                return pack_context(found) if RAG_PACKING else _top(found, top_k)
+
+        query_vec = await self.embed_query(question)
+        if timeline is not None:
+            timeline.mark("embedding")
+        found = await self.store.search(query_vec, fetch_k, source=source, with_vectors=RAG_PACKING)
+        if keywords is not None and len(keywords):
+            found = fuse_rrf(found, keywords.result(keywords.search(question, fetch_k, source)))
+            RETRIEVALS.labels("hybrid").inc()
+        else:
+            RETRIEVALS.labels("dense").inc()
+        if timeline is not None:
+            timeline.mark("search")
+        return pack_context(found) if RAG_PACKING else _top(found, top_k)
+
+
+def _top(found: dict, top_k: int) -> dict:
+    """The first top_k contexts of a search result, without packing."""
+    contexts = found["contexts"][:top_k]
+    context_sources = found.get("context_sources", [])[:top_k]
+    return {
+        "contexts": contexts,
+        "sources": list(dict.fromkeys(context_sources)) if context_sources else found["sources"],
+        "scores": found["scores"][:top_k],
+        "context_sources": context_sources,
+    }
+
+
+def build_rag_prompt(question: str, found: dict) -> str:
+    context_block = "\n\n".join(f"- {c}" for c in found["contexts"])
+    return (
+        "Use the following context to answer the question. \n\n" \
+        f"Context: \n{context_block}\n\n"
+        f"Question: {question}\n"
+        "Answer concisely using the context above"
+    )
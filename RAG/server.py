@@ -1,27 +1,49 @@
 import logging
 from fastapi import FastAPI
 from dotenv import load_dotenv
-from .data_loader import embed_texts
-from .vector_db import QDrantStorage
+from .retrieval import Retriever, build_rag_prompt
+from .speculative import SpeculativeRetriever, prefetched, clearly_needed
+from . import speculative
+from .turns import TurnManager
+from .stt_pool import SttPool
+from .answer_cache import ANSWER_CACHE, AnswerCache, self_contained
+from .metrics import ANSWER_CACHE_LOOKUPS, CALL_SETUP_SECONDS, PROMPT_TOKENS, TurnTimeline, track_call
+from .twilio_media import media_envelope
 from .custom_types import *
-from AGENTS.agent import Agent
+from AGENTS.agent import Agent, SHARED_CLIENTS, build_llms, prime_stream_llm, shared_clients, warm_phrase_cache, FRAME_MS, FRAME_BYTES
+from AGENTS.admission import LIMITERS, Overloaded, calls
+from AGENTS.system_prompts import BUSY_PHRASE, RETRY_PHRASE
+from AGENTS.phrase_cache import phrase_cache
+from AGENTS.ring_buffer import FrameRing
 import os
 import websockets
 import base64
 import json
 import asyncio
 import os, json, base64, asyncio, logging, inspect
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from speechmatics.tts import Voice
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from dataclasses import dataclass
+from contextlib import asynccontextmanager
 
 log = logging.getLogger("uvicorn.error")
 load_dotenv()
 
 ASAI_KEY = os.environ["ASAI_KEY"]
 
+# Stream the LLM reply sentence by sentence into TTS instead of waiting for the full answer.
+AGENT_STREAM_TTS = os.getenv("AGENT_STREAM_TTS", "0").lower() in ("1", "true", "yes")
+# Embed + search on stable partial transcripts while the caller is still talking.
+SPECULATIVE_RAG = os.getenv("SPECULATIVE_RAG", "0").lower() in ("1", "true", "yes")
+# Interrupt the agent mid-answer once the caller has said this many words (0 disables).
+BARGE_IN_MIN_WORDS = int(os.getenv("BARGE_IN_MIN_WORDS", "2"))
+
 # Twilio sends mu-law 8k. Configure AssemblyAI to accept mu-law 8k directly.
 
-ASAI_URL = (
+# ASAI_URL may point at a stand-in (e.g. the load-test fake) instead of AssemblyAI.
+ASAI_URL = os.getenv("ASAI_URL") or (
     "wss://streaming.assemblyai.com/v3/ws"
     "?sample_rate=8000"
     "&encoding=pcm_mulaw"
@@ -33,13 +55,73 @@ ASAI_URL = (
 @dataclass
 class State:
     streamSID: str = None
-
-app = FastAPI()
+    # Frames are sent faster than real time, so track when Twilio will
+    # actually finish playing what it has been given.
+    playing_until: float = 0.0
+    turn_count: int = 0
+    timeline: TurnTimeline = None
+    # Frames sent for the current reply, kept while it may go into the answer cache.
+    recording: list = None
+
+    def playing(self) -> bool:
+        return time.monotonic() < self.playing_until
+
+# Shared by every call on this worker; started once in lifespan().
+retriever = Retriever()
+# Created in lifespan() once the collection is known (ANSWER_CACHE=1).
+answer_cache: AnswerCache | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global answer_cache
+    await retriever.start()
+    if ANSWER_CACHE:
+        answer_cache = AnswerCache(retriever.store.collection)
+    # Fills in the background; calls connect directly until sessions are ready.
+    await stt_pool.start()
+    if SHARED_CLIENTS:
+        start = time.perf_counter()
+        shared_clients.start()
+        log.info("Shared LLM/TTS clients ready in %.0f ms", (time.perf_counter() - start) * 1000)
+    elif AGENT_STREAM_TTS:
+        # Per-call clients still share openai's lazily imported streaming
+        # modules; load them now rather than during the first caller's turn.
+        prime_stream_llm(build_llms()[1])
+    try:
+        await warm_phrase_cache()
+    except Exception:
+        # Calls still work without it; phrases are rendered and cached on first use.
+        log.exception("Phrase cache warm-up failed")
+    try:
+        yield
+    finally:
+        await stt_pool.close()
+        await shared_clients.close()
+        await retriever.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/media")
 def media_http():
     return {"status": "WebSocket endpoint ready"}
 
+@app.get("/stats")
+def stats_http():
+    return {
+        "embedding_cache": retriever.cache.stats() if retriever.cache else None,
+        "phrase_cache": phrase_cache.stats(),
+        "speculative_rag": speculative.stats,
+        "stt_pool": stt_pool.stats(),
+        "admission": {limiter.name: limiter.stats() for limiter in LIMITERS},
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+    }
+
+@app.get("/metrics")
+def metrics_http():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 def _ws_connect_kwargs():
     """
     websockets library renamed `extra_headers` -> `additional_headers` in newer versions.
@@ -51,24 +133,78 @@ def _ws_connect_kwargs():
     return {"extra_headers": {"Authorization": ASAI_KEY}}
 
 
+def connect_aai():
+    return websockets.connect(
+        ASAI_URL,
+        ping_interval=5,
+        ping_timeout=60,
+        **_ws_connect_kwargs(),
+    )
+
+
+# Pre-opened AssemblyAI sessions (STT_POOL_SIZE); started in lifespan().
+stt_pool = SttPool(connect_aai)
+
+
+# Close code for calls turned away by admission control ("Try Again Later").
+CLOSE_BUSY = 1013
+
+
+async def turn_away(twilio_ws: WebSocket):
+    """Play the "all lines busy" clip to a call that was not admitted and hang up."""
+    frames = phrase_cache.get(BUSY_PHRASE, Voice.SARAH, FRAME_BYTES) or []
+    try:
+        stream_sid = None
+        async with asyncio.timeout(2):
+            while stream_sid is None:
+                msg = json.loads(await twilio_ws.receive_text())
+                if msg.get("event") == "start":
+                    stream_sid = msg["start"]["streamSid"]
+        prefix, suffix = media_envelope(stream_sid)
+        for frame in frames:
+            await twilio_ws.send_text(prefix + base64.b64encode(frame).decode("ascii") + suffix)
+        # Twilio echoes the mark once the clip has played; hanging up earlier cuts it off.
+        await twilio_ws.send_text(json.dumps({"event": "mark", "streamSid": stream_sid, "mark": {"name": "busy"}}))
+        async with asyncio.timeout(len(frames) * FRAME_MS / 1000 + 1):
+            while json.loads(await twilio_ws.receive_text()).get("event") not in ("mark", "stop"):
+                pass
+    except (TimeoutError, WebSocketDisconnect):
+        pass
+    try:
+        await twilio_ws.close(code=CLOSE_BUSY)
+    except RuntimeError:
+        pass  # Twilio already hung up
+
+
 @app.websocket("/media")
 async def media_ws(twilio_ws: WebSocket):
     await twilio_ws.accept()
-    # 50ms of mu-law @ 8kHz = 0.05 * 8000 = 400 bytes
-    FRAME_BYTES = 400
-    buf = bytearray()
+    setup_start = time.monotonic()
+    try:
+        async with calls.slot():
+            await handle_call(twilio_ws, setup_start)
+    except Overloaded:
+        log.warning("Call turned away: %s active, %s waiting", calls.active, calls.waiting)
+        await turn_away(twilio_ws)
+
+
+async def handle_call(twilio_ws: WebSocket, setup_start: float):
+    ring = FrameRing(FRAME_BYTES)
     state = State()
     agent = Agent()
+    speculator = SpeculativeRetriever(retriever, top_k=5)
 
-    async with websockets.connect(
-        ASAI_URL,
-        ping_interval=5,
-        ping_timeout=60,
-        **_ws_connect_kwargs(),
-    ) as aai_ws:
+    def mark(stage, last=False):
+        if state.timeline is not None:
+            state.timeline.mark(stage, last)
+
+    agent.on_audio = lambda: mark("tts_first_byte")
+
+    # A pre-opened session when the pool has one, else a fresh handshake.
+    async with track_call(agent), stt_pool.session() as aai_ws:
+        CALL_SETUP_SECONDS.observe(time.monotonic() - setup_start)
 
         async def twilio_to_aai():
-            nonlocal buf
             try:
                 while True:
                     raw = await twilio_ws.receive_text()
@@ -78,12 +214,10 @@ async def media_ws(twilio_ws: WebSocket):
                     if ev == "media":
                         payload_b64 = msg["media"]["payload"]
                         chunk = base64.b64decode(payload_b64)
-                        buf.extend(chunk)
 
-                        # send in ~50ms frames
-                        while len(buf) >= FRAME_BYTES:
-                            await aai_ws.send(bytes(buf[:FRAME_BYTES]))
-                            del buf[:FRAME_BYTES]
+                        # send in ~50ms frames, straight out of the ring (send copies them into the WS frame)
+                        for frame in ring.push(chunk):
+                            await aai_ws.send(frame)
 
                     elif ev == "stop":
                         break
@@ -92,63 +226,146 @@ async def media_ws(twilio_ws: WebSocket):
 
 
             except WebSocketDisconnect:
-                # flush remainder (optional)
-                if buf:
-                    await aai_ws.send(bytes(buf))
-                    buf.clear()
-                # tell AssemblyAI the stream is done
-                await aai_ws.send(json.dumps({"type": "Terminate"}))
+                pass
+            # flush remainder (optional)
+            if len(ring):
+                await aai_ws.send(ring.tail())
+            # tell AssemblyAI the stream is done (on "stop" too, or aai_to_log never returns)
+            await aai_ws.send(json.dumps({"type": "Terminate"}))
 
 
         async def query_rag_no_inngest(question, top_k):
-            query_vec = embed_texts([question])[0]
-            store = QDrantStorage()
-            found = store.search(query_vec, top_k)
-
-            context_block = "\n\n".join(f"- {c}" for c in found["contexts"])
-            user_content = (
-                "Use the following context to answer the question. \n\n" \
-                f"Context: \n{context_block}\n\n"
-                f"Question: {question}\n"
-                "Answer concisely using the context above"
-            )
-
-            return user_content
+            found = await retriever.search(question, top_k, timeline=state.timeline)
+            return build_rag_prompt(question, found), found
         
             
-        async def talk(answer):
-            async for mulaw_frame in agent.speech(text=answer):
+        async def clear_twilio_audio():
+            # Drop audio Twilio has buffered but not yet played.
+            if state.streamSID and state.playing():
+                await twilio_ws.send_text(json.dumps({"event": "clear", "streamSid": state.streamSID}))
+            state.playing_until = 0.0
+
+        turns = TurnManager(on_interrupt=clear_twilio_audio)
+
+        async def send_frames(frames):
+            prefix, suffix = media_envelope(state.streamSID)
+            sent = 0
+            async for mulaw_frame in frames:
+                        state.playing_until = max(state.playing_until, time.monotonic()) + FRAME_MS / 1000
                         payload_b64 = base64.b64encode(mulaw_frame).decode("ascii")
-                        msg = {
-                            "event": "media",                    # REQUIRED: Tells Twilio this is audio
-                            "streamSid": state.streamSID,        # REQUIRED: Your stored streamSid
-                            "media": {                           # REQUIRED: Media object
-                                "payload": payload_b64,          # REQUIRED: base64 μ-law 8000Hz
-                            }
-                        }
+                        await twilio_ws.send_text(prefix + payload_b64 + suffix)    # REQUIRED: send_text(), not send_json()
+                        if state.recording is not None:
+                            state.recording.append(mulaw_frame)
+                        if not sent:
+                            mark("first_frame")
+                        sent += 1
+            if sent:
+                mark("last_frame", last=True)
 
-                        await twilio_ws.send_text(json.dumps(msg))    # REQUIRED: send_text(), not send_json()
+        async def talk(answer):
+            await send_frames(agent.speech(text=answer))
 
+        async def replay(frames):
+            for frame in frames:
+                yield frame
 
-        async def safe_send_event(question: str):
+        async def cached_answer(question):
+            """(cached answer or None, question embedding or None if the cache does not apply)."""
+            if answer_cache is None or not self_contained(question):
+                ANSWER_CACHE_LOOKUPS.labels("skipped").inc()
+                return None, None
+            try:
+                vector = await retriever.embed_query(question)
+            except Overloaded:
+                raise
+            except Exception:
+                # The cache is an optimization: answer the turn without it.
+                log.exception("Answer cache lookup failed")
+                ANSWER_CACHE_LOOKUPS.labels("error").inc()
+                return None, None
+            hit = answer_cache.get(vector)
+            ANSWER_CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+            return hit, vector
+
+        async def timed(sentences, stage):
+            async for sentence in sentences:
+                yield sentence
+            mark(stage)
+
+        async def respond(stage):
+            # Streaming mode speaks each sentence while the LLM is still writing the next.
+            if AGENT_STREAM_TTS:
+                await send_frames(agent.speech_stream(timed(agent.invoke_stream(), stage)))
+                PROMPT_TOKENS.observe(agent.memory.last_tokens)
+                return agent.last_output
+            answer = await agent.invoke()
+            PROMPT_TOKENS.observe(agent.memory.last_tokens)
+            mark(stage)
+            if answer:
+                await talk(answer=answer.response)
+            return answer
+
+        async def safe_send_event(question: str, prefetch=None, timeline=None):
+            state.timeline = timeline
+            interrupted = False
             try:
 
                 agent.messages.append({"role": "user", "content": question})
+                # The reply before any retrieval is phase 1; one written with context is phase 2.
+                stage = "llm_phase1"
+
+                # A near-duplicate of an answered question: replay that answer
+                # with no LLM, retrieval or TTS call.
+                hit, vector = await cached_answer(question)
+                if hit is not None:
+                    mark("answer_cache")
+                    agent.messages.append({"role": "ai", "content": hit.response})
+                    await send_frames(replay(hit.frames))
+                    return
+
+                # Retrieval already ran on the partial transcript and clearly
+                # hit: hand the context over now and skip the phase-1 round trip.
+                found = await prefetched(prefetch)
+                context = None
+                if clearly_needed(found):
+                    agent.messages.append({"role": "user", "content": build_rag_prompt(question, found)})
+                    stage = "llm_phase2"
+                    context = found
 
                 end_turn = False
                 while end_turn == False:
-                    answer = await agent.invoke()
-                    if answer:
-                        await talk(answer=answer.response)
+                    state.recording = [] if vector is not None else None
+                    answer = await respond(stage)
                     if answer.query_rag:
-                         user_content = await query_rag_no_inngest(question=question, top_k=5)
+                         user_content, context = await query_rag_no_inngest(question=question, top_k=5)
                          agent.messages.append({"role": "user", "content": user_content})
+                         stage = "llm_phase2"
                     if answer.end_turn:
                         end_turn = True
 
+                # Only answers written from retrieved context, and spoken in
+                # full (no TTS error cut them short), are reused.
+                if (vector is not None and context is not None and stage == "llm_phase2"
+                        and not answer.query_rag and agent.speech_complete):
+                    answer_cache.put(vector, question, answer.response, state.recording,
+                                     context.get("context_sources") or context["sources"])
+
                                           
+            except asyncio.CancelledError:
+                interrupted = True
+                raise
+            except Overloaded as e:
+                # Shed by admission control: say so rather than go quiet.
+                log.warning("Turn shed: %s", e)
+                await talk(answer=RETRY_PHRASE)
             except Exception:
                 log.exception("Inngest send failed")
+            finally:
+                state.recording = None
+                if state.timeline is timeline:
+                    state.timeline = None
+                if timeline is not None:
+                    timeline.finish(interrupted=interrupted)
 
 
         async def aai_to_log():
@@ -164,13 +381,35 @@ async def media_ws(twilio_ws: WebSocket):
                         )
                     
                         if data.get("end_of_turn") == True:
-                            asyncio.create_task(safe_send_event(data["transcript"]))
+                            state.turn_count += 1
+                            timeline = TurnTimeline(state.streamSID, state.turn_count)
+                            prefetch = speculator.take(data["transcript"]) if SPECULATIVE_RAG else None
+                            # Cancels the previous turn (and flushes its audio) if still running.
+                            turns.start(safe_send_event, data["transcript"], prefetch, timeline)
+                            continue
+
+                        if SPECULATIVE_RAG:
+                            speculator.update(data)
+                        if (
+                            BARGE_IN_MIN_WORDS
+                            and (turns.busy or state.playing())
+                            and len(data["transcript"].split()) >= BARGE_IN_MIN_WORDS
+                        ):
+                            log.info("Barge-in: %s", data["transcript"])
+                            await turns.interrupt()
              
 
             except Exception as e:
                 log.error("AssemblyAI read error: %s", e)
-
-        await asyncio.gather(twilio_to_aai(), aai_to_log())
+            finally:
+                speculator.cancel()
+                turns.cancel()
+
+        try:
+            await asyncio.gather(twilio_to_aai(), aai_to_log())
+        finally:
+            # A call without the shared clients owns an aiohttp session for TTS; don't leak it.
+            await agent.close_tts_client()
 
 
 
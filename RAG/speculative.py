@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import re
+
+log = logging.getLogger("uvicorn.error")
+
+# Start a lookup once this many words are final and the caller pauses this long.
+SPECULATIVE_MIN_WORDS = int(os.getenv("SPECULATIVE_MIN_WORDS", "3"))
+SPECULATIVE_DEBOUNCE = float(os.getenv("SPECULATIVE_DEBOUNCE", "0.25"))
+# Fraction of the final transcript's words the speculated query must cover.
+SPECULATIVE_MATCH_RATIO = float(os.getenv("SPECULATIVE_MATCH_RATIO", "0.8"))
+# Top cosine score at which retrieval counts as "clearly needed".
+SPECULATIVE_MIN_SCORE = float(os.getenv("SPECULATIVE_MIN_SCORE", "0.4"))
+SPECULATIVE_WAIT = float(os.getenv("SPECULATIVE_WAIT", "1.5"))
+
+stats = {"started": 0, "used": 0, "discarded": 0}
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.casefold())
+
+
+def stable_text(turn: dict) -> str:
+    """The finalized words of an AssemblyAI Turn message."""
+    words = turn.get("words")
+    if words:
+        return " ".join(w["text"] for w in words if w.get("word_is_final"))
+    return turn.get("transcript", "")
+
+
+class SpeculativeRetriever:
+    """
+    Per-call lookahead retrieval. Partial transcripts feed update(); once
+    the stable prefix is long enough and the caller pauses, an embed+search
+    starts in the background and is restarted whenever that prefix changes.
+    At end of turn, take() returns the prefetched result if it was run on
+    (nearly) the same question, so the agent can skip its phase-1 round trip.
+    """
+
+    def __init__(self, retriever, top_k: int = 5):
+        self.retriever = retriever
+        self.top_k = top_k
+        self._query = ""
+        self._task: asyncio.Task | None = None
+
+    def update(self, turn: dict) -> None:
+        text = stable_text(turn)
+        norm = " ".join(_words(text))
+        if len(norm.split()) < SPECULATIVE_MIN_WORDS or norm == self._query:
+            return
+        self.cancel()
+        self._query = norm
+        self._task = asyncio.create_task(self._lookup(text))
+
+    async def _lookup(self, text: str) -> dict:
+        await asyncio.sleep(SPECULATIVE_DEBOUNCE)
+        stats["started"] += 1
+        return await self.retriever.search(text, self.top_k)
+
+    def _matches(self, transcript: str) -> bool:
+        final = _words(transcript)
+        guess = self._query.split()
+        if not final or len(guess) > len(final) or final[:len(guess)] != guess:
+            return False
+        return len(guess) / len(final) >= SPECULATIVE_MATCH_RATIO
+
+    def take(self, transcript: str) -> asyncio.Task | None:
+        """
+        Claim the lookup for this final transcript. Call it synchronously when
+        end_of_turn arrives, before the next turn's partials reuse this object;
+        pass the result to prefetched(). Returns None if the guess was off.
+        """
+        task, matched = self._task, self._task is not None and self._matches(transcript)
+        self._task, self._query = None, ""
+        if task is not None and not matched:
+            task.cancel()
+            stats["discarded"] += 1
+            return None
+        return task
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            if not self._task.done():
+                self._task.cancel()
+            stats["discarded"] += 1
+            self._task = None
+        self._query = ""
+
+
+async def prefetched(task: asyncio.Task | None) -> dict | None:
+    if task is None:
+        return None
+    try:
+        found = await asyncio.wait_for(task, SPECULATIVE_WAIT)
+    except Exception as e:
+        log.warning("Speculative retrieval failed: %s", e)
+        return None
+    stats["used"] += 1
+    return found
+
+
+def clearly_needed(found: dict | None) -> bool:
+    return bool(found and found.get("scores") and found["scores"][0] >= SPECULATIVE_MIN_SCORE)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from .metrics import STT_SESSIONS
+
+log = logging.getLogger("uvicorn.error")
+
+# Idle AssemblyAI sessions kept open ahead of calls (0 disables the pool).
+# Each pooled session saves one handshake, and a session taken by a call is
+# replaced in the background, so size it to the calls that can arrive
+# within one handshake at peak, plus one: calls/s x handshake seconds + 1.
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "0"))
+# How often idle sessions are pinged, and how long a pong may take.
+STT_POOL_PING_INTERVAL = float(os.getenv("STT_POOL_PING_INTERVAL", "10"))
+STT_POOL_PING_TIMEOUT = float(os.getenv("STT_POOL_PING_TIMEOUT", "2"))
+# Idle sessions older than this are closed and replaced, so none is handed
+# out close to an upstream idle limit.
+STT_POOL_MAX_IDLE = float(os.getenv("STT_POOL_MAX_IDLE", "60"))
+
+
+def _is_open(ws) -> bool:
+    return ws.close_code is None
+
+
+class SttPool:
+    """
+    Pre-opened, authenticated streaming STT sessions for new calls.
+
+    `connect` is a zero-argument callable returning an awaitable that opens
+    one session (e.g. a websockets.connect(...) call). start() fills the pool
+    in the background; session() hands a call an idle session if one is
+    open (else connects directly, as without a pool) and refills the pool
+    behind it. A maintenance task pings idle sessions every
+    STT_POOL_PING_INTERVAL and replaces any that fail or are older than
+    STT_POOL_MAX_IDLE. Sessions are single-use: each call closes its own.
+    """
+
+    def __init__(self, connect, size: int = STT_POOL_SIZE):
+        self._connect = connect
+        self.size = size
+        self._idle: list[tuple[object, float]] = []  # (session, opened at), oldest first
+        self._connecting = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._maintainer: asyncio.Task | None = None
+        self._closed = False
+        self.counts = {"pooled": 0, "direct": 0, "opened": 0, "replaced": 0, "failed": 0}
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": len(self._idle), "connecting": self._connecting, **self.counts}
+
+    async def start(self):
+        if self.size <= 0:
+            return
+        self._top_up()
+        self._maintainer = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        self._closed = True
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(ws.close() for ws, _ in idle), return_exceptions=True)
+
+    def _top_up(self):
+        if self._closed:
+            return
+        for _ in range(self.size - len(self._idle) - self._connecting):
+            self._connecting += 1
+            task = asyncio.create_task(self._open())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _open(self):
+        try:
+            ws = await self._connect()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The next maintenance pass (or call) tries again.
+            self.counts["failed"] += 1
+            log.warning("STT pool connect failed: %s", e)
+            return
+        finally:
+            self._connecting -= 1
+        if self._closed:
+            await ws.close()
+            return
+        self.counts["opened"] += 1
+        self._idle.append((ws, time.monotonic()))
+
+    async def _healthy(self, ws, opened: float) -> bool:
+        if not _is_open(ws) or time.monotonic() - opened > STT_POOL_MAX_IDLE:
+            return False
+        try:
+            pong = await ws.ping()
+            await asyncio.wait_for(pong, STT_POOL_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(STT_POOL_PING_INTERVAL)
+            # Sessions stay available to calls while their pings are in flight.
+            checking = list(self._idle)
+            healthy = await asyncio.gather(*(self._healthy(ws, opened) for ws, opened in checking))
+            for item, ok in zip(checking, healthy):
+                if not ok and item in self._idle:
+                    self._idle.remove(item)
+                    self.counts["replaced"] += 1
+                    asyncio.create_task(item[0].close())
+            self._top_up()
+
+    def _take(self):
+        while self._idle:
+            ws, _ = self._idle.pop(0)
+            if _is_open(ws):
+                return ws
+            self.counts["replaced"] += 1
+        return None
+
+    @asynccontextmanager
+    async def session(self):
+        """An open STT session for one call, closed when the block exits."""
+        ws = self._take()
+        if ws is not None:
+            self.counts["pooled"] += 1
+            STT_SESSIONS.labels("pool").inc()
+        self._top_up()
+        if ws is None:
+            self.counts["direct"] += 1
+            STT_SESSIONS.labels("direct").inc()
+            ws = await self._connect()
+        try:
+            yield ws
+        finally:
+            await ws.close()
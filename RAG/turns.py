@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+log = logging.getLogger("uvicorn.error")
+
+
+class TurnManager:
+    """
+    Runs at most one conversational turn per call.
+
+    start() cancels whatever turn is still in flight (its LLM calls, RAG
+    lookup and TTS producer all unwind through CancelledError), waits for it
+    to finish unwinding, calls `on_interrupt` so audio still queued for the
+    caller can be flushed, and only then starts the new turn. Two turns
+    therefore never touch the same Agent.messages at once.
+    """
+
+    def __init__(self, on_interrupt):
+        self.on_interrupt = on_interrupt
+        self._task: asyncio.Task | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, fn, *args) -> asyncio.Task:
+        previous = self._task
+        if self.busy:
+            previous.cancel()
+        self._task = asyncio.create_task(self._run(previous, fn, *args))
+        return self._task
+
+    async def _run(self, previous, fn, *args):
+        if previous is not None:
+            await asyncio.wait([previous])
+            await self._flush()
+        await fn(*args)
+
+    async def _flush(self):
+        try:
+            await self.on_interrupt()
+        except Exception:
+            log.exception("Barge-in flush failed")
+
+    async def interrupt(self) -> None:
+        """Cancel the in-flight turn (if any) and flush, without starting a new one."""
+        if self.busy:
+            task = self._task
+            task.cancel()
+            await asyncio.wait([task])
+        await self._flush()
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
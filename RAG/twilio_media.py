@@ -0,0 +1,17 @@
+import json
+
+
+def media_envelope(stream_sid):
+    """
+    The Twilio media message split around its payload. Base64 needs no JSON
+    escaping, so each frame is just prefix + payload + suffix.
+    """
+    msg = json.dumps({
+        "event": "media",                    # REQUIRED: Tells Twilio this is audio
+        "streamSid": stream_sid,             # REQUIRED: Your stored streamSid
+        "media": {                           # REQUIRED: Media object
+            "payload": "",                   # REQUIRED: base64 μ-law 8000Hz
+        }
+    })
+    prefix, suffix = msg.rsplit('""', 1)
+    return prefix + '"', '"' + suffix
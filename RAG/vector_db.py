@@ -1,42 +1,565 @@
+import asyncio
+import json
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, PointIdsList, Filter, FieldCondition, MatchValue, MatchAny,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, SearchParams, QuantizationSearchParams,
+    PayloadSchemaType,
+)
+
+
+def _resolve(url, collection):
+    # Allow overriding via env vars so Docker can point to host/other container.
+    url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
+    collection = collection or os.getenv("QDRANT_COLLECTION", "docs3")
+    return url, collection
+
+
+# "qdrant" (default) or "numpy" for the in-process NumpyVectorStorage.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+@dataclass
+class CollectionProfile:
+    """
+    How the Qdrant collection is laid out and searched.
+
+    quantization: "none", "int8" (scalar) or "binary". Quantized vectors
+    stay in RAM (always_ram) while the float32 originals can live on disk
+    (on_disk) and are only read to rescore the oversampled candidates.
+    """
+    quantization: str = "none"
+    always_ram: bool = True
+    on_disk: bool = False
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_on_disk: bool = False
+    search_ef: int | None = None
+    oversampling: float = 2.0
+    rescore: bool = True
+
+    @classmethod
+    def from_env(cls):
+        ef = os.getenv("QDRANT_HNSW_EF")
+        return cls(
+            quantization=os.getenv("QDRANT_QUANTIZATION", "none"),
+            always_ram=_env_bool("QDRANT_QUANTIZED_ALWAYS_RAM", True),
+            on_disk=_env_bool("QDRANT_ON_DISK", False),
+            hnsw_m=int(os.getenv("QDRANT_HNSW_M", "16")),
+            hnsw_ef_construct=int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100")),
+            hnsw_on_disk=_env_bool("QDRANT_HNSW_ON_DISK", False),
+            search_ef=int(ef) if ef else None,
+            oversampling=float(os.getenv("QDRANT_OVERSAMPLING", "2.0")),
+            rescore=_env_bool("QDRANT_RESCORE", True),
+        )
+
+    def vectors_config(self, dim):
+        return VectorParams(size=dim, distance=Distance.COSINE, on_disk=self.on_disk)
+
+    def hnsw_config(self):
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct, on_disk=self.hnsw_on_disk)
+
+    def quantization_config(self):
+        if self.quantization == "int8":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=self.always_ram)
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=self.always_ram))
+        if self.quantization != "none":
+            raise ValueError(f"Unknown quantization: {self.quantization}")
+        return None
+
+    def search_params(self):
+        quantization = None
+        if self.quantization != "none":
+            quantization = QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        return SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+    def create_kwargs(self, dim):
+        return {
+            "vectors_config": self.vectors_config(dim),
+            "hnsw_config": self.hnsw_config(),
+            "quantization_config": self.quantization_config(),
+        }
+
+
+def source_filter(source):
+    """Filter on payload `source`; accepts one source or a list of them."""
+    if source is None:
+        return None
+    if isinstance(source, str):
+        match = MatchValue(value=source)
+    else:
+        match = MatchAny(any=list(source))
+    return Filter(must=[FieldCondition(key="source", match=match)])
+
+
+def _to_search_result(hits):
+    """
+    (payload, score) pairs, or (payload, score, vector) triples, -> contexts,
+    sources, and per-context scores and sources (plus "vectors" when given).
+    """
+    contexts = []
+    scores = []
+    context_sources = []
+    vectors = []
+    sources = set()
+
+    for payload, score, *vector in hits:
+        payload = payload or {}
+        text = payload.get("text", "")
+        source = payload.get("source", "")
+        if text:
+            contexts.append(text)
+            scores.append(score)
+            context_sources.append(source)
+            sources.add(source)
+            if vector and vector[0] is not None:
+                vectors.append(vector[0])
+    result = {"contexts": contexts, "sources": list(sources), "scores": scores, "context_sources": context_sources}
+    if vectors:
+        result["vectors"] = vectors
+    return result
+
 
 class QDrantStorage:
-    def __init__(self, url=None, collection=None, dim=3072):
-        # Allow overriding via env vars so Docker can point to host/other container.
-        url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
-        collection = collection or os.getenv("QDRANT_COLLECTION", "docs3")
+    def __init__(self, url=None, collection=None, dim=3072, profile=None):
+        url, collection = _resolve(url, collection)
 
-        self.client = QdrantClient(url=url, timeout=30)
+        # `location` also accepts ":memory:" for Qdrant's local mode.
+        self.client = QdrantClient(location=url, timeout=30)
         self.collection = collection
+        self.profile = profile or CollectionProfile.from_env()
         if not self.client.collection_exists(self.collection):
             self.client.create_collection(
                 collection_name=self.collection,
-                vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+                **self.profile.create_kwargs(dim),
             )
-    
+            self.client.create_payload_index(self.collection, "source", PayloadSchemaType.KEYWORD)
+
+    def apply_profile(self):
+        """Push the profile's quantization/HNSW settings onto an existing collection."""
+        self.client.update_collection(
+            self.collection,
+            hnsw_config=self.profile.hnsw_config(),
+            quantization_config=self.profile.quantization_config(),
+        )
+        self.client.create_payload_index(self.collection, "source", PayloadSchemaType.KEYWORD)
+
     def upsert(self, ids, vectors, payloads):
         points = [PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i]) for i in range(len(ids))]
         self.client.upsert(self.collection, points=points)
-        
 
-    
-    def search(self, query_vector, top_k: int = 5):
+    def delete(self, ids, batch_size: int = 1000):
+        for start in range(0, len(ids), batch_size):
+            self.client.delete(
+                self.collection,
+                points_selector=PointIdsList(points=ids[start:start + batch_size]),
+            )
+
+    def save(self):
+        """Qdrant applies every write as it is made; see NumpyVectorStorage.save()."""
+
+    def set_payload(self, payloads: dict[str, dict]):
+        """Merge fields into existing points' payloads, keyed by point id."""
+        groups: dict[str, list[str]] = {}
+        for point_id, fields in payloads.items():
+            groups.setdefault(json.dumps(fields, sort_keys=True), []).append(point_id)
+        for fields, ids in groups.items():
+            self.client.set_payload(self.collection, payload=json.loads(fields), points=ids)
+
+    def ids_for_source(self, source: str) -> set[str]:
+        """All point ids whose payload `source` matches, via scroll."""
+        ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                self.collection,
+                scroll_filter=source_filter(source),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(p.id) for p in points)
+            if offset is None:
+                return ids
+
+    def search(self, query_vector, top_k: int = 5, source=None, with_vectors=False):
         results = self.client.query_points(
             collection_name=self.collection,
             query = query_vector,
+            query_filter=source_filter(source),
+            search_params=self.profile.search_params(),
+            with_payload=True,
+            with_vectors=with_vectors,
+            limit=top_k
+        )
+        return _to_search_result((r.payload, r.score, r.vector) for r in results.points)
+
+
+class AsyncQDrantStorage:
+    """
+    Async twin of QDrantStorage for the serving path.
+    Build one per process and call ensure_collection() once at startup;
+    search() then never blocks the event loop.
+    """
+
+    def __init__(self, url=None, collection=None, dim=3072, profile=None):
+        url, collection = _resolve(url, collection)
+
+        self.client = AsyncQdrantClient(location=url, timeout=30)
+        self.collection = collection
+        self.dim = dim
+        self.profile = profile or CollectionProfile.from_env()
+
+    async def ensure_collection(self):
+        if not await self.client.collection_exists(self.collection):
+            await self.client.create_collection(
+                collection_name=self.collection,
+                **self.profile.create_kwargs(self.dim),
+            )
+            await self.client.create_payload_index(self.collection, "source", PayloadSchemaType.KEYWORD)
+
+    async def search(self, query_vector, top_k: int = 5, source=None, with_vectors=False):
+        results = await self.client.query_points(
+            collection_name=self.collection,
+            query=query_vector,
+            query_filter=source_filter(source),
+            search_params=self.profile.search_params(),
             with_payload=True,
+            with_vectors=with_vectors,
             limit=top_k
         )
-        contexts = []
-        sources = set()
-
-        for r in results.points:
-            payload = r.payload or {}  # Direct attribute access
-            text = payload.get("text", "")
-            source = payload.get("source", "")
-            if text:
-                contexts.append(text)
-                sources.add(source)
-        return {"contexts": contexts, "sources": list(sources)}
+        return _to_search_result((r.payload, r.score, r.vector) for r in results.points)
+
+    async def close(self):
+        await self.client.close()
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Rows [0, count) of `matrix` are the points `ids`/`payloads`, as loaded together."""
+    ids: tuple
+    payloads: tuple
+    matrix: np.ndarray
+    count: int
+
+
+class NumpyVectorStorage:
+    """
+    In-process vector index with the same upsert/search interface as
+    QDrantStorage. Vectors are L2-normalized and kept in a memory-mapped
+    float16 (or int8) matrix under NUMPY_INDEX_DIR/<collection>/, and search
+    is a blocked matrix-vector product plus argpartition top-k.
+
+    The index on disk is a series of generations. Each one is an immutable
+    points-<n>.json plus the vectors-<n>.bin it names (a generation that
+    only changed payloads reuses the previous matrix), and meta.json points
+    at the current one; replacing meta.json is the only step that makes a
+    generation visible. Writes go into an unpublished working generation
+    until save(), so published files are never modified. Readers
+    (readonly=True, as the server opens it) never create or change files,
+    and searches read one immutable _Snapshot that refresh() swaps in with
+    a single assignment.
+
+    Meant for small-to-medium knowledge bases where a network round-trip
+    per turn costs more than scanning the whole matrix.
+    """
+
+    BLOCK_ROWS = 16384
+
+    def __init__(self, path=None, collection=None, dim=3072, dtype=None, readonly=False):
+        self.collection = collection or os.getenv("QDRANT_COLLECTION", "docs3")
+        base = path or os.getenv("NUMPY_INDEX_DIR", ".vector_index")
+        self.dir = Path(base) / self.collection
+        self.dim = dim
+        self.dtype = np.dtype(dtype or os.getenv("NUMPY_INDEX_DTYPE", "float16"))
+        if self.dtype not in (np.float16, np.int8):
+            raise ValueError(f"Unsupported index dtype: {self.dtype}")
+        self.readonly = readonly
+        self._loaded_mtime = None
+        self._reload = threading.Lock()
+        self._load()
+
+    # -- persistence ---------------------------------------------------------
+
+    @property
+    def _meta_path(self):
+        return self.dir / "meta.json"
+
+    def _load(self):
+        # Writer state: the published generation plus changes not yet saved.
+        self.generation = 0
+        self.count = 0
+        self.capacity = 0
+        self.ids: list[str] = []
+        self.payloads: list[dict] = []
+        self._files = {}
+        self._working = None  # vectors file being written, once vectors changed
+        self._dirty = False
+        if not self._meta_path.is_file():
+            if self.readonly:
+                raise FileNotFoundError(
+                    f"No NumPy index at {self.dir}; run the ingest CLI with VECTOR_BACKEND=numpy first"
+                )
+            self.matrix = np.zeros((0, self.dim), dtype=self.dtype)
+            self._row = {}
+            self._publish()
+            return
+
+        mtime = self._meta_path.stat().st_mtime_ns
+        meta = json.loads(self._meta_path.read_text())
+        if meta["dim"] != self.dim or np.dtype(meta["dtype"]) != self.dtype:
+            raise ValueError(
+                f"Index at {self.dir} is dim={meta['dim']} dtype={meta['dtype']}, "
+                f"expected dim={self.dim} dtype={self.dtype}"
+            )
+        # Indexes written before generations used fixed file names.
+        self._files = {"points": meta.get("points", "points.json"), "vectors": meta.get("vectors", "vectors.bin")}
+        self.generation = meta.get("generation", 0)
+        self.count = meta["count"]
+        self.capacity = meta["capacity"]
+        points = json.loads((self.dir / self._files["points"]).read_text())
+        self.ids = [p["id"] for p in points]
+        self.payloads = [p["payload"] for p in points]
+        self.matrix = self._map(self.dir / self._files["vectors"], self.capacity, "r")
+        self._row = {point_id: i for i, point_id in enumerate(self.ids)}
+        self._loaded_mtime = mtime
+        self._publish()
+
+    def _map(self, file, capacity, mode):
+        if not capacity:
+            return np.zeros((0, self.dim), dtype=self.dtype)
+        return np.memmap(file, dtype=self.dtype, mode=mode, shape=(capacity, self.dim))
+
+    def _publish(self):
+        self._snapshot = _Snapshot(tuple(self.ids), tuple(self.payloads), self.matrix, self.count)
+
+    def _writable(self, needed=0):
+        """
+        Copy the published vectors into a working file of the next
+        generation (at least `needed` rows) the first time they change.
+        """
+        if self.readonly:
+            raise PermissionError(f"NumPy index at {self.dir} was opened read-only")
+        self._dirty = True
+        if self._working is not None and needed <= self.capacity:
+            return
+        capacity = max(self.capacity, 1024)
+        while capacity < needed:
+            capacity *= 2
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # An outgrown working file is left for save() to remove.
+        working = self.dir / f"vectors-{self.generation + 1}-{capacity}.bin"
+        matrix = np.memmap(working, dtype=self.dtype, mode="w+", shape=(capacity, self.dim))
+        for start in range(0, self.count, self.BLOCK_ROWS):
+            stop = min(start + self.BLOCK_ROWS, self.count)
+            matrix[start:stop] = self.matrix[start:stop]
+        self.matrix, self.capacity, self._working = matrix, capacity, working
+
+    def save(self):
+        """
+        Publish the working generation: write its points file, then replace
+        meta.json to point at it. Readers only ever see whole generations.
+        """
+        if not self._dirty:
+            return
+        generation = self.generation + 1
+        files = {"points": f"points-{generation}.json", "vectors": self._files.get("vectors")}
+        if self._working is not None:
+            self.matrix.flush()
+            files["vectors"] = self._working.name
+        tmp = self.dir / (files["points"] + ".tmp")
+        tmp.write_text(json.dumps([{"id": i, "payload": p} for i, p in zip(self.ids, self.payloads)]))
+        os.replace(tmp, self.dir / files["points"])
+        meta = {"dim": self.dim, "dtype": self.dtype.name, "count": self.count, "capacity": self.capacity,
+                "generation": generation, **files}
+        tmp = self.dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self._meta_path)
+        self._loaded_mtime = self._meta_path.stat().st_mtime_ns
+
+        previous, self._files = self._files, files
+        self.generation = generation
+        if self._working is not None:
+            # The working file is published now; further writes need a new one.
+            self.matrix = self._map(self._working, self.capacity, "r")
+            self._working = None
+        self._dirty = False
+        self._publish()
+        self._remove_unused(keep=set(files.values()) | set(previous.values()))
+
+    def _remove_unused(self, keep):
+        # The previous generation stays for readers that are loading it right
+        # now; older ones (and files of an interrupted writer) go.
+        for file in self.dir.iterdir():
+            if file.name in keep or file.name == "meta.json":
+                continue
+            if file.name.startswith(("points", "vectors")):
+                file.unlink(missing_ok=True)
+
+    def refresh(self):
+        """Reload if another process (e.g. the ingest CLI) published a new generation."""
+        if self._meta_path.stat().st_mtime_ns == self._loaded_mtime:
+            return
+        with self._reload:
+            if self._meta_path.stat().st_mtime_ns != self._loaded_mtime:
+                try:
+                    self._load()
+                except FileNotFoundError:
+                    # Read meta.json just before a writer replaced it and
+                    # removed that generation's files: load the new one.
+                    self._load()
+
+    # -- quantization --------------------------------------------------------
+
+    def _encode(self, vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32)
+        v /= np.maximum(np.linalg.norm(v, axis=-1, keepdims=True), 1e-12)
+        if self.dtype == np.int8:
+            return np.round(v * 127).astype(np.int8)
+        return v.astype(np.float16)
+
+    @property
+    def _scale(self):
+        return 127.0 if self.dtype == np.int8 else 1.0
+
+    # -- QDrantStorage interface --------------------------------------------
+
+    def upsert(self, ids, vectors, payloads):
+        """Stage points in the working generation; save() publishes them."""
+        encoded = self._encode(vectors)
+        new = sum(1 for i in ids if i not in self._row)
+        self._writable(self.count + new)
+        for point_id, vec, payload in zip(ids, encoded, payloads):
+            row = self._row.get(point_id)
+            if row is None:
+                row = self.count
+                self.count += 1
+                self._row[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(payload)
+            else:
+                self.payloads[row] = payload
+            self.matrix[row] = vec
+
+    def set_payload(self, payloads: dict[str, dict]):
+        # Payload-only changes reuse the published vectors file.
+        if self.readonly:
+            raise PermissionError(f"NumPy index at {self.dir} was opened read-only")
+        for point_id, fields in payloads.items():
+            row = self._row.get(point_id)
+            if row is not None:
+                self.payloads[row] = {**self.payloads[row], **fields}
+                self._dirty = True
+
+    def delete(self, ids, batch_size: int = 1000):
+        gone = {self._row[i] for i in ids if i in self._row}
+        if not gone:
+            return
+        self._writable()
+        keep = np.array([row for row in range(self.count) if row not in gone], dtype=np.int64)
+        # Compact the working file in place: keep is ascending and
+        # keep[i] >= i, so each block only reads rows not yet overwritten.
+        for start in range(0, len(keep), self.BLOCK_ROWS):
+            rows = keep[start:start + self.BLOCK_ROWS]
+            self.matrix[start:start + len(rows)] = self.matrix[rows]
+        self.ids = [self.ids[row] for row in keep]
+        self.payloads = [self.payloads[row] for row in keep]
+        self.count = len(keep)
+        self._row = {point_id: i for i, point_id in enumerate(self.ids)}
+
+    def ids_for_source(self, source: str) -> set[str]:
+        return {i for i, p in zip(self.ids, self.payloads) if p.get("source") == source}
+
+    @staticmethod
+    def _source_mask(snap: _Snapshot, source) -> np.ndarray | None:
+        if source is None:
+            return None
+        wanted = {source} if isinstance(source, str) else set(source)
+        return np.fromiter((p.get("source") in wanted for p in snap.payloads), dtype=bool, count=snap.count)
+
+    def scores(self, query_vector, snap: _Snapshot | None = None) -> np.ndarray:
+        snap = snap or self._snapshot
+        q = np.asarray(query_vector, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        out = np.empty(snap.count, dtype=np.float32)
+        for start in range(0, snap.count, self.BLOCK_ROWS):
+            stop = min(start + self.BLOCK_ROWS, snap.count)
+            out[start:stop] = snap.matrix[start:stop].astype(np.float32) @ q
+        return out / self._scale
+
+    def top_k(self, query_vector, top_k: int = 5, source=None, snap: _Snapshot | None = None) -> list[tuple[int, float]]:
+        snap = snap or self._snapshot
+        if not snap.count:
+            return []
+        scores = self.scores(query_vector, snap)
+        mask = self._source_mask(snap, source)
+        if mask is not None:
+            scores[~mask] = -np.inf
+            top_k = min(top_k, int(mask.sum()))
+            if not top_k:
+                return []
+        k = min(top_k, snap.count)
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(int(i), float(scores[i])) for i in idx]
+
+    def search(self, query_vector, top_k: int = 5, source=None, with_vectors=False):
+        snap = self._snapshot
+        hits = self.top_k(query_vector, top_k, source, snap)
+        if with_vectors:
+            return _to_search_result(
+                (snap.payloads[i], score, snap.matrix[i].astype(np.float32) / self._scale) for i, score in hits
+            )
+        return _to_search_result((snap.payloads[i], score) for i, score in hits)
+
+
+class AsyncNumpyVectorStorage:
+    """AsyncQDrantStorage-compatible wrapper; the scan runs off the event loop."""
+
+    def __init__(self, url=None, collection=None, dim=3072):
+        self.index = NumpyVectorStorage(collection=collection, dim=dim, readonly=True)
+        self.collection = self.index.collection
+
+    async def ensure_collection(self):
+        self.index.refresh()
+
+    def _search(self, query_vector, top_k, source, with_vectors):
+        self.index.refresh()
+        return self.index.search(query_vector, top_k, source, with_vectors)
+
+    async def search(self, query_vector, top_k: int = 5, source=None, with_vectors=False):
+        # Reload (if the ingest CLI rewrote the index) in the same worker
+        # call as the scan, keeping both the file reads and the load off the loop.
+        return await asyncio.to_thread(self._search, query_vector, top_k, source, with_vectors)
+
+    async def close(self):
+        pass
+
+
+def get_storage(url=None, collection=None, dim=3072):
+    """Sync storage for the configured VECTOR_BACKEND."""
+    if VECTOR_BACKEND == "numpy":
+        return NumpyVectorStorage(collection=collection, dim=dim)
+    return QDrantStorage(url=url, collection=collection, dim=dim)
+
+
+def get_async_storage(url=None, collection=None, dim=3072):
+    """Async storage for the configured VECTOR_BACKEND."""
+    if VECTOR_BACKEND == "numpy":
+        return AsyncNumpyVectorStorage(url=url, collection=collection, dim=dim)
+    return AsyncQDrantStorage(url=url, collection=collection, dim=dim)
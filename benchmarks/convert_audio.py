@@ -0,0 +1,96 @@
+"""
+Throughput and alias rejection of the 16 kHz PCM -> 8 kHz μ-law converters.
+
+    python -m benchmarks.convert_audio
+    python -m benchmarks.convert_audio --seconds 60 --chunk-bytes 2048
+
+Each engine converts the same synthetic speech-band signal, fed in
+TTS-sized chunks and flushed at the end, the way agent.synthesize_frames
+drives it. Throughput is measured in CPU time of this single thread, so
+"frames/s" is per core; "x realtime" says how many concurrent calls one
+core could keep up with. "alias dB" is the output level of a 5 kHz tone
+relative to a 1 kHz tone: anything above 4 kHz should be filtered out, not
+folded back into the voice band.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from AGENTS.convert_audio import AudioopPcm16kToMulaw8k, Pcm16kToMulaw8k, audioop
+
+ENGINES = {"numpy": Pcm16kToMulaw8k, "audioop": AudioopPcm16kToMulaw8k}
+RATE = 16000
+
+
+def speech_like(seconds, rng):
+    t = np.arange(int(seconds * RATE)) / RATE
+    tones = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, 6.28)) for f in (180, 720, 1400, 2600))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    x = 3000 * tones * envelope + 300 * rng.normal(size=t.size)
+    return np.clip(x, -32768, 32767).astype("<i2").tobytes()
+
+
+def tone(freq, seconds=1.0):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (8000 * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes()
+
+
+def convert(engine, pcm, chunk_bytes, frame_ms):
+    conv = engine(frame_ms=frame_ms)
+    frames = []
+    for i in range(0, len(pcm), chunk_bytes):
+        frames.extend(conv.feed(pcm[i:i + chunk_bytes]))
+    frames.extend(conv.flush(pad_to_full_frame=True))
+    return frames
+
+
+def level(frames):
+    # Decode through the table-free G.711 inverse so the numpy engine needs no audioop.
+    u = ~np.frombuffer(b"".join(frames), dtype=np.uint8).astype(np.int32) & 0xFF
+    mag = (((u & 0x0F) << 3) + 0x84 << ((u >> 4) & 0x07)) - 0x84
+    y = np.where(u & 0x80, -mag, mag).astype(np.float64)
+    y = y[len(y) // 10:-len(y) // 10]
+    return np.sqrt(np.mean(y ** 2))
+
+
+def run_engine(name, pcm, seconds, chunk_bytes, frame_ms, repeat):
+    engine = ENGINES[name]
+    convert(engine, pcm[:chunk_bytes * 4], chunk_bytes, frame_ms)  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.process_time()
+        frames = convert(engine, pcm, chunk_bytes, frame_ms)
+        best = min(best, time.process_time() - t0)
+    alias = level(convert(engine, tone(5000), chunk_bytes, frame_ms))
+    ref = level(convert(engine, tone(1000), chunk_bytes, frame_ms))
+    return {
+        "engine": name,
+        "frames_per_s": len(frames) / best,
+        "x_realtime": seconds / best,
+        "alias_db": 20 * np.log10(max(alias, 1e-9) / ref),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="audio length per run")
+    parser.add_argument("--chunk-bytes", type=int, default=2048, help="PCM bytes per feed() (tts.BYTES_PER_CHUNK)")
+    parser.add_argument("--frame-ms", type=int, default=50, help="output frame size (agent.FRAME_MS)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--engines", nargs="*", default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    pcm = speech_like(args.seconds, np.random.default_rng(0))
+    print(f"{args.seconds:.0f}s of 16 kHz audio, {args.chunk_bytes}-byte chunks, {args.frame_ms} ms frames")
+    print(f"{'engine':<10}{'frames/s':>12}{'x realtime':>12}{'alias dB':>10}")
+    for name in args.engines:
+        if name == "audioop" and audioop is None:
+            print(f"{name:<10}{'(audioop not available)':>34}")
+            continue
+        r = run_engine(name, pcm, args.seconds, args.chunk_bytes, args.frame_ms, args.repeat)
+        print(f"{r['engine']:<10}{r['frames_per_s']:>12.0f}{r['x_realtime']:>12.0f}{r['alias_db']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Pages/s of the PDF parse + chunk engines behind data_loader.iter_pdf_records.
+
+    python -m benchmarks.pdf_parse
+    python -m benchmarks.pdf_parse --pages 600 --workers 1 4
+
+Builds a large catalog by repeating the pages of the bundled PDFs (or
+--pdf files) and times each engine end to end: text extraction, splitting
+into 1000-token chunks with 200 tokens of overlap, and materializing the
+chunk records. "llama" is PDFReader + SentenceSplitter (one page at a
+time, the original path); "fast" is RAG/pdf_chunker, run with each
+--workers count.
+
+Wall time is what ingest waits for. CPU is this process plus its pool
+workers, so it shows what the parallelism costs.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def build_catalog(sources, pages, out):
+    writer = PdfWriter()
+    readers = [PdfReader(str(p)) for p in sources]
+    all_pages = [page for r in readers for page in r.pages]
+    for i in range(pages):
+        writer.add_page(all_pages[i % len(all_pages)])
+    with open(out, "wb") as f:
+        writer.write(f)
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run(engine, path, workers):
+    from RAG.data_loader import iter_pdf_records
+
+    stats = {}
+    cpu, start = cpu_seconds(), time.perf_counter()
+    chunks = list(iter_pdf_records(path, stats, workers=workers, engine=engine))
+    wall = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu
+    spanning = sum(c.page_end > c.page_start for c in chunks)
+    return {"pages": stats["pages"], "chunks": len(chunks), "spanning": spanning, "wall": wall, "cpu": cpu}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", default=[str(ROOT / "test2.pdf"), str(ROOT / "UMichCSCourses.pdf")])
+    parser.add_argument("--pages", type=int, default=300, help="pages in the generated catalog")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "catalog.pdf")
+        build_catalog(args.pdf, args.pages, path)
+        print(f"{args.pages}-page catalog from {', '.join(Path(p).name for p in args.pdf)}, {os.cpu_count()} CPUs")
+        print(f"{'engine':<16}{'pages/s':>10}{'wall s':>9}{'cpu s':>8}{'chunks':>8}{'spanning':>10}")
+        runs = [("llama", 1)] + [("fast", w) for w in dict.fromkeys(args.workers)]
+        for engine, workers in runs:
+            best = min((run(engine, path, workers) for _ in range(args.repeat)), key=lambda r: r["wall"])
+            name = engine if engine == "llama" else f"fast x{workers}"
+            print(f"{name:<16}{best['pages'] / best['wall']:>10.1f}{best['wall']:>9.2f}{best['cpu']:>8.2f}"
+                  f"{best['chunks']:>8}{best['spanning']:>10}")
+
+
+if __name__ == "__main__":
+    main()
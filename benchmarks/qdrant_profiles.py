@@ -0,0 +1,116 @@
+"""
+Recall vs latency for Qdrant collection profiles.
+
+    python -m benchmarks.qdrant_profiles                      # local-mode QdrantClient
+    python -m benchmarks.qdrant_profiles --url http://localhost:6333
+    python -m benchmarks.qdrant_profiles --vectors embeddings.npy
+
+Each profile gets its own collection loaded with the same vectors, then
+every query is run through QDrantStorage.search's query path and compared
+against exact numpy top-k. Without --vectors, clustered synthetic vectors
+stand in for real embeddings.
+
+Local mode is a brute-force reference implementation: it accepts the
+quantization/HNSW settings but does not build those indexes, so on
+":memory:" the numbers mostly show the cost of the query path. Point --url
+at a real Qdrant server to see the quantization trade-off itself.
+"""
+import argparse
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+from RAG.vector_db import CollectionProfile, QDrantStorage
+
+
+PROFILES = {
+    "float32": CollectionProfile(),
+    "int8": CollectionProfile(quantization="int8", oversampling=1.0),
+    "int8-os2": CollectionProfile(quantization="int8", oversampling=2.0),
+    "int8-os2-disk": CollectionProfile(quantization="int8", oversampling=2.0, on_disk=True),
+    "binary-os2": CollectionProfile(quantization="binary", oversampling=2.0),
+    "binary-os4": CollectionProfile(quantization="binary", oversampling=4.0),
+}
+
+
+def synthetic(n, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vecs = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_profile(name, profile, url, vectors, queries, truth, k, batch):
+    collection = f"bench-{name}-{uuid.uuid4().hex[:8]}"
+    store = QDrantStorage(url=url, collection=collection, dim=vectors.shape[1], profile=profile)
+    ids = [str(uuid.UUID(int=i)) for i in range(len(vectors))]
+    for start in range(0, len(vectors), batch):
+        stop = start + batch
+        store.upsert(
+            ids[start:stop],
+            vectors[start:stop].tolist(),
+            [{"source": "bench", "text": str(i)} for i in range(start, stop)],
+        )
+
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        result = store.search(q.tolist(), k)
+        latencies.append(time.perf_counter() - t0)
+        got = {int(t) for t in result["contexts"]}
+        hits += len(got & set(expected.tolist()))
+
+    store.client.delete_collection(collection)
+    lat = np.array(latencies) * 1000
+    return {
+        "profile": name,
+        "recall": hits / truth.size,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:", help="Qdrant location (default: local mode)")
+    parser.add_argument("--vectors", help=".npy file of embeddings to index instead of synthetic data")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--profiles", nargs="*", default=list(PROFILES), choices=list(PROFILES))
+    args = parser.parse_args()
+    if args.url == ":memory:":
+        # Local mode warns that payload indexes and search_params are no-ops; see above.
+        warnings.filterwarnings("ignore", category=UserWarning, module="qdrant_client")
+        warnings.filterwarnings("ignore", category=UserWarning, module="RAG.vector_db")
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        vectors = synthetic(args.points, args.dim, clusters=max(args.points // 50, 1), rng=rng)
+    picks = rng.integers(0, len(vectors), size=args.queries)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(args.queries, vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.top_k)
+
+    print(f"{len(vectors)} points x {vectors.shape[1]} dims, {args.queries} queries, top_k={args.top_k}, url={args.url}")
+    print(f"{'profile':<16}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name in args.profiles:
+        r = run_profile(name, PROFILES[name], args.url, vectors, queries, truth, args.top_k, args.batch)
+        print(f"{r['profile']:<16}{r['recall']:>8.3f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
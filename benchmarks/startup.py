@@ -0,0 +1,93 @@
+"""
+Worker import time and per-call setup cost.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --imports 5 --calls 50
+
+import: seconds to import each serving-path module in a fresh interpreter
+(median of --imports runs), i.e. what a new uvicorn worker pays before it
+can take a call.
+
+agent: Agent() construction as media_ws does it for every call, with
+per-call clients (SHARED_CLIENTS=0) and with the shared clients built
+once by SharedClients.start(), each mode in its own interpreter. "first"
+is the first call on the worker, "median" the rest, and "stream" what the
+first AGENT_STREAM_TTS turn pays for the OpenAI streaming client's lazy
+imports. Nothing here talks to OpenAI or Speechmatics.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Clients are built but never called; they only need keys to exist.
+for key in ("OPENAI_API_KEY", "SPEECHMATICS_API_KEY", "ASAI_KEY"):
+    os.environ.setdefault(key, "benchmark-unused")
+
+MODULES = ["RAG.retrieval", "AGENTS.agent", "RAG.server"]
+
+
+def import_seconds(module, runs):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+async def agent_setup(calls, shared):
+    from AGENTS.agent import Agent, prime_stream_llm, shared_clients
+
+    startup = 0.0
+    if shared:
+        start = time.perf_counter()
+        shared_clients.start()
+        startup = time.perf_counter() - start
+    times = []
+    stream = None
+    for _ in range(calls):
+        start = time.perf_counter()
+        agent = Agent()
+        times.append(time.perf_counter() - start)
+        if stream is None:
+            start = time.perf_counter()
+            prime_stream_llm(agent.stream_llm)
+            stream = time.perf_counter() - start
+        await agent.close_tts_client()
+    await shared_clients.close()
+    return startup, times[0], statistics.median(times[1:]), stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imports", type=int, default=3, help="fresh interpreters per module")
+    parser.add_argument("--calls", type=int, default=20, help="Agent() constructions per mode")
+    parser.add_argument("--agent-mode", choices=["per-call", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.agent_mode:
+        print(*asyncio.run(agent_setup(args.calls, args.agent_mode == "shared")))
+        return
+
+    print(f"{'import':<24}{'ms':>10}")
+    for module in MODULES:
+        print(f"{module:<24}{import_seconds(module, args.imports) * 1000:>10.0f}")
+
+    print(f"\n{'agent':<24}{'startup ms':>12}{'first ms':>10}{'median ms':>11}{'stream ms':>11}")
+    for mode in ("per-call", "shared"):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-m", "benchmarks.startup", "--agent-mode", mode,
+                              "--calls", str(args.calls)], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        startup, first, median, stream = map(float, out.strip().splitlines()[-1].split())
+        name = f"{mode} clients"
+        print(f"{name:<24}{startup * 1000:>12.1f}{first * 1000:>10.2f}{median * 1000:>11.3f}{stream * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
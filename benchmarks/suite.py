@@ -0,0 +1,267 @@
+"""
+Micro-benchmarks for the per-frame and per-turn hot paths.
+
+    python -m benchmarks.suite                          # run everything, print a table
+    python -m benchmarks.suite --output bench.json      # also save results
+    python -m benchmarks.suite --compare bench.json     # show change vs a saved run
+    python -m benchmarks.suite --only convert envelope  # name prefixes
+
+Cases:
+- convert.*: Pcm16kToMulaw8k feed() over 1 s of audio in N-byte chunks, then flush()
+- generate_audio: tts.generate_audio re-chunking 10 s of PCM from a stand-in client into a queue
+- envelope.*: one 50 ms μ-law frame -> Twilio media message (spliced envelope vs json.dumps)
+- pdf.*: load_and_chunk_pdf on the bundled PDFs (PDF_ENGINE; see benchmarks.pdf_parse for engines)
+- search.*: QDrantStorage result post-processing (_to_search_result), context packing
+  (MMR + merge over 20 candidates) and build_rag_prompt
+- keywords.*: BM25 index over 5000 synthetic chunks: exact-identifier lookup and plain search
+
+Each case reports the best mean time per op over --repeat runs. Results
+carry enough metadata (git revision, Python, NumPy) to tell runs apart.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import platform
+import subprocess
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+PDFS = ["test2.pdf", "UMichCSCourses.pdf"]
+
+
+def measure(fn, repeat, min_time=0.2):
+    """Best mean seconds per call of fn() over `repeat` timing runs."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _speech(seconds):
+    t = np.arange(int(seconds * 16000)) / 16000
+    x = 4000 * (np.sin(2 * np.pi * 300 * t) + 0.5 * np.sin(2 * np.pi * 1700 * t))
+    return x.astype("<i2").tobytes()
+
+
+def bench_convert(repeat):
+    from AGENTS.agent import FRAME_MS
+    from AGENTS.convert_audio import Pcm16kToMulaw8k
+
+    pcm = _speech(1.0)
+    out = {}
+    for chunk in (320, 2048, 8192):
+        def run():
+            conv = Pcm16kToMulaw8k(frame_ms=FRAME_MS)
+            for i in range(0, len(pcm), chunk):
+                conv.feed(pcm[i:i + chunk])
+            conv.flush(pad_to_full_frame=True)
+        sec = measure(run, repeat)
+        out[f"convert.chunk{chunk}"] = {"seconds": sec, "x_realtime": 1.0 / sec}
+    return out
+
+
+class _Content:
+    def __init__(self, data, chunk):
+        self.data, self.chunk = data, chunk
+
+    async def iter_chunked(self, n):
+        for i in range(0, len(self.data), self.chunk):
+            yield self.data[i:i + self.chunk]
+
+
+class _Response:
+    def __init__(self, data, chunk):
+        self.content = _Content(data, chunk)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _TTSClient:
+    """Stands in for speechmatics AsyncClient: replays fixed PCM in network-sized chunks."""
+
+    def __init__(self, data, chunk):
+        self.data, self.chunk = data, chunk
+
+    async def generate(self, **kwargs):
+        return _Response(self.data, self.chunk)
+
+
+def bench_generate_audio(repeat):
+    from AGENTS.tts import BUFFER_SIZE, generate_audio
+
+    pcm = _speech(10.0)
+    client = _TTSClient(pcm, BUFFER_SIZE - 96)  # uneven, like real reads
+    loop = asyncio.new_event_loop()
+
+    def run():
+        queue = asyncio.Queue()
+        loop.run_until_complete(generate_audio("x", queue, None, client))
+    try:
+        sec = measure(run, repeat)
+    finally:
+        loop.close()
+    return {"generate_audio": {"seconds": sec, "mb_per_s": len(pcm) / sec / 1e6}}
+
+
+def bench_envelope(repeat):
+    from RAG.twilio_media import media_envelope
+
+    sid = "MZ" + "0123456789abcdef" * 2
+    frame = bytes(range(256)) + bytes(144)  # 400 bytes = 50 ms of μ-law
+    prefix, suffix = media_envelope(sid)
+
+    def spliced():
+        return prefix + base64.b64encode(frame).decode("ascii") + suffix
+
+    def dumps():
+        return json.dumps({"event": "media", "streamSid": sid,
+                           "media": {"payload": base64.b64encode(frame).decode("ascii")}})
+
+    assert json.loads(spliced()) == json.loads(dumps())
+    return {
+        "envelope.spliced": {"seconds": measure(spliced, repeat)},
+        "envelope.json_dumps": {"seconds": measure(dumps, repeat)},
+    }
+
+
+def bench_pdf(repeat):
+    from RAG.data_loader import iter_pdf_chunks, load_and_chunk_pdf
+
+    out = {}
+    for name in PDFS:
+        path = ROOT / name
+        if not path.is_file():
+            continue
+        stats = {}
+        chunks = len(list(iter_pdf_chunks(str(path), stats)))
+        sec = measure(lambda: load_and_chunk_pdf(str(path)), max(1, repeat // 2), min_time=0)
+        out[f"pdf.{path.stem}"] = {
+            "seconds": sec, "pages": stats.get("pages", 0), "chunks": chunks,
+            "pages_per_s": stats.get("pages", 0) / sec,
+        }
+    return out
+
+
+def bench_search(repeat):
+    from qdrant_client.models import ScoredPoint
+
+    from RAG.context_packing import pack_context
+    from RAG.retrieval import build_rag_prompt
+    from RAG.vector_db import _to_search_result
+
+    text = "EECS 281 Data Structures and Algorithms. " * 25  # ~1000-char chunk
+    out = {}
+    for k in (5, 20):
+        points = [ScoredPoint(id=i, version=0, score=1.0 - i / 100,
+                              payload={"source": f"doc{i % 3}.pdf", "text": text}) for i in range(k)]
+        out[f"search.post_top{k}"] = {
+            "seconds": measure(lambda: _to_search_result((p.payload, p.score) for p in points), repeat)
+        }
+    found = _to_search_result((p.payload, p.score) for p in points)
+    out["search.rag_prompt_top20"] = {"seconds": measure(lambda: build_rag_prompt("what is eecs 281", found), repeat)}
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((20, 3072)).astype(np.float32)
+    with_vectors = _to_search_result((p.payload, p.score, v) for p, v in zip(points, vectors))
+    out["search.pack_top20"] = {"seconds": measure(lambda: pack_context(with_vectors), repeat)}
+    return out
+
+
+def bench_keywords(repeat):
+    import tempfile
+
+    from RAG.keyword_index import KeywordIndex
+
+    rng = np.random.default_rng(0)
+    vocab = np.array([f"term{i}" for i in range(20000)])
+    with tempfile.TemporaryDirectory() as tmp:
+        index = KeywordIndex("bench", path=tmp)
+        for i in range(5000):
+            index.add(str(i), "bench", f"EECS {100 + i % 900} " + " ".join(rng.choice(vocab, 150)))
+        start = time.perf_counter()
+        index.save()
+        build = time.perf_counter() - start
+        return {
+            "keywords.exact_5k": {"seconds": measure(lambda: index.exact("prerequisites for EECS 482 term5"), repeat),
+                                  "build_s": build},
+            "keywords.bm25_5k": {"seconds": measure(lambda: index.search("term1 term2 term3 term4 term5"), repeat)},
+        }
+
+
+CASES = {
+    "convert": bench_convert,
+    "generate_audio": bench_generate_audio,
+    "envelope": bench_envelope,
+    "pdf": bench_pdf,
+    "search": bench_search,
+    "keywords": bench_keywords,
+}
+
+
+def metadata():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {
+        "git": rev,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def _fmt_time(sec):
+    if sec < 1e-3:
+        return f"{sec * 1e6:.2f} us"
+    if sec < 1:
+        return f"{sec * 1e3:.2f} ms"
+    return f"{sec:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", default=[], help="run cases whose name starts with one of these")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="previous JSON results to diff against")
+    args = parser.parse_args()
+
+    results = {}
+    for name, case in CASES.items():
+        if args.only and not any(name.startswith(p) or p.startswith(name) for p in args.only):
+            continue
+        for key, value in case(args.repeat).items():
+            if not args.only or any(key.startswith(p) for p in args.only):
+                results[key] = value
+
+    baseline = {}
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+
+    print(f"{'case':<28}{'time/op':>12}{'vs base':>10}  extra")
+    for key, r in results.items():
+        delta = ""
+        if key in baseline:
+            delta = f"{100 * (r['seconds'] / baseline[key]['seconds'] - 1):+.1f}%"
+        extra = " ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items() if k != "seconds")
+        print(f"{key:<28}{_fmt_time(r['seconds']):>12}{delta:>10}  {extra}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"meta": metadata(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Local stand-ins for the services RAG.server talks to, for load tests.
+
+- upstream_app: one FastAPI app serving a fake OpenAI API under /v1
+  (chat completions, streamed or not, and embeddings) and a fake
+  Speechmatics TTS API under /tts (POST /tts/generate/<voice> streams raw
+  16 kHz PCM). Point OPENAI_BASE_URL at .../v1 and SPEECHMATICS_TTS_URL at
+  .../tts.
+- serve_assemblyai: a fake AssemblyAI v3 streaming socket. It reads the
+  caller's audio and, every `turn_every` seconds of it, speaks a question
+  as a few partial Turn messages followed by an end_of_turn Turn. Each
+  opening handshake is held for `stt_handshake` seconds (TLS plus auth
+  against the real service), so the STT session pool's savings show up
+  in call setup time.
+
+The fake LLM follows the agent's two-phase protocol: a bare question gets
+the "checking" phrase with query_rag=true, and a message carrying
+retrieved context gets a final answer with end_turn=true.
+"""
+import asyncio
+import base64
+import json
+import re
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from websockets.asyncio.server import serve
+
+from AGENTS.system_prompts import CHECKING_PHRASE
+
+EMBED_DIM = 3072
+# Twilio clients tag their first audio frame with this, so the fake STT knows which call it is serving.
+CALL_MARKER = b"CALL"
+
+QUESTIONS = [
+    "what does the data structures course cover",
+    "which courses teach machine learning",
+    "are there any classes on computer networks",
+    "what are the prerequisites for operating systems",
+    "tell me about the computer vision course",
+    "which course covers compilers",
+]
+ANSWER = "Based on the course catalog, that class covers {topic}. Is there anything else you would like to know?"
+
+
+@dataclass
+class FakeConfig:
+    llm_first_token: float = 0.35   # seconds until the first chat token
+    llm_token_interval: float = 0.02
+    embed_latency: float = 0.08
+    tts_first_byte: float = 0.15
+    tts_speed: float = 4.0          # PCM streamed at this multiple of real time
+    tts_seconds_per_char: float = 0.05
+    turn_every: float = 10.0        # seconds of caller audio between questions
+    first_turn: float = 2.0
+    partial_interval: float = 0.15
+    stt_handshake: float = 0.0      # seconds added to each STT WebSocket handshake
+    stt_sessions: int = 0           # STT sessions opened so far
+    # call id -> monotonic times of each end_of_turn sent (read by the Twilio client)
+    eot_times: dict = field(default_factory=dict)
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> np.ndarray:
+    """Hashed bag of words: texts that share words get similar vectors."""
+    v = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        v[zlib.crc32(word.encode()) % dim] += 1.0
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def _reply(messages) -> dict:
+    last = messages[-1]["content"] if messages else ""
+    if isinstance(last, list):
+        last = " ".join(part.get("text", "") for part in last)
+    if "Use the following context" in last:
+        topic = re.search(r"Question: (.*)", last)
+        topic = topic.group(1).strip() if topic else "that topic"
+        return {"response": ANSWER.format(topic=topic), "end_turn": True, "query_rag": False}
+    return {"response": CHECKING_PHRASE, "end_turn": False, "query_rag": True}
+
+
+def _pcm(seconds: float) -> bytes:
+    t = np.arange(int(seconds * 16000)) / 16000
+    return (6000 * np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 2 * t)).astype("<i2").tobytes()
+
+
+def upstream_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(config.embed_latency)
+        data = []
+        for i, text in enumerate(texts):
+            vec = fake_embedding(text, body.get("dimensions") or EMBED_DIM)
+            if body.get("encoding_format") == "base64":
+                emb = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+            else:
+                emb = vec.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": 8, "total_tokens": 8}}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        content = json.dumps(_reply(body["messages"]))
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body["model"]}
+        usage = {"prompt_tokens": 100, "completion_tokens": len(content) // 4, "total_tokens": 100 + len(content) // 4}
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.llm_first_token + config.llm_token_interval * len(content) / 4)
+            return JSONResponse({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                             "message": {"role": "assistant", "content": content, "refusal": None}}],
+                "usage": usage,
+            })
+
+        async def sse():
+            def chunk(delta, finish=None):
+                msg = {**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}]}
+                return f"data: {json.dumps(msg)}\n\n"
+
+            await asyncio.sleep(config.llm_first_token)
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(content), 4):
+                yield chunk({"content": content[i:i + 4]})
+                await asyncio.sleep(config.llm_token_interval)
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    @app.post("/tts/generate/{voice}")
+    async def tts(voice: str, request: Request):
+        text = (await request.json()).get("text", "")
+        pcm = _pcm(max(len(text) * config.tts_seconds_per_char, 0.2))
+        chunk = 4096
+        interval = chunk / 32000 / config.tts_speed
+
+        async def stream():
+            await asyncio.sleep(config.tts_first_byte)
+            for i in range(0, len(pcm), chunk):
+                yield pcm[i:i + chunk]
+                await asyncio.sleep(interval)
+
+        return StreamingResponse(stream(), media_type="application/octet-stream")
+
+    return app
+
+
+def _turn(words, final_count, end):
+    return json.dumps({
+        "type": "Turn",
+        "transcript": " ".join(words),
+        "end_of_turn": end,
+        "end_of_turn_confidence": 0.9 if end else 0.1,
+        "words": [{"text": w, "word_is_final": i < final_count} for i, w in enumerate(words)],
+    })
+
+
+async def _speak(ws, config: FakeConfig, call: str, n: int):
+    words = QUESTIONS[n % len(QUESTIONS)].split()
+    # Words arrive a couple at a time, the way streaming STT reveals them.
+    for shown in range(2, len(words), 2):
+        await ws.send(_turn(words[:shown], shown - 1, False))
+        await asyncio.sleep(config.partial_interval)
+    await ws.send(_turn(words, len(words), True))
+    config.eot_times.setdefault(call, []).append(time.monotonic())
+
+
+async def _assemblyai_session(ws, config: FakeConfig):
+    await ws.send(json.dumps({"type": "Begin", "id": uuid.uuid4().hex, "expires_at": int(time.time()) + 3600}))
+    call, received, turns, speaking = None, 0, 0, None
+    next_turn = config.first_turn * 8000  # μ-law 8 kHz: 8000 bytes per second
+    async for msg in ws:
+        if isinstance(msg, str):
+            if json.loads(msg).get("type") == "Terminate":
+                break
+            continue
+        if call is None:
+            call = msg[len(CALL_MARKER):len(CALL_MARKER) + 8].decode("ascii", "replace") if msg.startswith(CALL_MARKER) else "?"
+        received += len(msg)
+        if received >= next_turn and (speaking is None or speaking.done()):
+            speaking = asyncio.create_task(_speak(ws, config, call, turns))
+            turns += 1
+            next_turn = received + config.turn_every * 8000
+    if speaking is not None:
+        speaking.cancel()
+    await ws.send(json.dumps({"type": "Termination", "audio_duration_seconds": received / 8000}))
+
+
+async def serve_assemblyai(config: FakeConfig, host: str = "127.0.0.1", port: int = 0):
+    """Start the fake STT socket; returns the websockets server (see .sockets for the port)."""
+    async def handshake(connection, request):
+        config.stt_sessions += 1
+        await asyncio.sleep(config.stt_handshake)
+
+    async def handler(ws):
+        try:
+            await _assemblyai_session(ws, config)
+        except Exception:
+            pass
+
+    return await serve(handler, host, port, max_size=None, process_request=handshake)
@@ -0,0 +1,313 @@
+"""
+Offline end-to-end load test for RAG.server:app.
+
+    python -m loadtest.run --calls 20 --duration 60
+    python -m loadtest.run --calls 50 --env AGENT_STREAM_TTS=1 --env SPECULATIVE_RAG=1
+
+Starts the fake OpenAI / Speechmatics / AssemblyAI services from
+loadtest.fakes in this process, launches one uvicorn worker (loadtest.serve)
+pointed at them with local-mode Qdrant, then drives N concurrent simulated
+Twilio /media sessions that stream μ-law in real time.
+
+Reported:
+- first-audio latency per turn: fake STT end_of_turn -> first media frame
+  back at the simulated Twilio client, as percentiles;
+- the server's own per-stage timeline (voice_turn_stage_seconds, scraped
+  from /metrics) as approximate p50/p95 from histogram buckets;
+- answer cache hits and misses (--env ANSWER_CACHE=1);
+- calls shed by admission control (--env MAX_CALLS=...) and each
+  limiter's admitted/rejected counts;
+- call setup (voice_call_setup_seconds: WebSocket accept -> STT session
+  open) and how many calls got a pre-opened STT session. Compare
+  --env STT_POOL_SIZE=0 with a pool to see the handshake savings;
+- event-loop lag of the worker and its CPU, in total and per call.
+
+Everything except the worker runs in this process, so keep an eye on this
+process's CPU too (printed as "driver cpu"): if it saturates, the
+numbers describe the driver, not the server.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+import websockets
+
+from loadtest.fakes import CALL_MARKER, FakeConfig, serve_assemblyai, upstream_app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class CallStats:
+    def __init__(self):
+        self.latencies = []
+        self.frames = 0
+        self.clears = 0
+        self.shed = False
+        self.error = None
+
+
+async def twilio_call(idx, url, config, duration, frame_ms, stats: CallStats):
+    call = f"{idx:08d}"
+    sid = f"MZload{call}"
+    frame = b"\xff" * (8 * frame_ms)  # μ-law silence
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await ws.send(json.dumps({"event": "start", "start": {"streamSid": sid}, "streamSid": sid}))
+
+            async def receive():
+                matched = 0
+                # The sender sees (and reports) the socket closing.
+                with contextlib.suppress(websockets.ConnectionClosed):
+                    async for raw in ws:
+                        msg = json.loads(raw)
+                        if msg.get("event") == "clear":
+                            stats.clears += 1
+                        elif msg.get("event") == "media":
+                            stats.frames += 1
+                            eots = config.eot_times.get(call, [])
+                            if matched < len(eots):
+                                # First audio back since the latest unanswered end of turn.
+                                stats.latencies.append(time.monotonic() - eots[-1])
+                                matched = len(eots)
+
+            receiver = asyncio.create_task(receive())
+            start = next_at = time.monotonic()
+            first = True
+            while time.monotonic() - start < duration:
+                payload = CALL_MARKER + call.encode() + frame[len(CALL_MARKER) + 8:] if first else frame
+                first = False
+                await ws.send(json.dumps({
+                    "event": "media", "streamSid": sid,
+                    "media": {"payload": base64.b64encode(payload).decode("ascii")},
+                }))
+                next_at += frame_ms / 1000
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            await ws.send(json.dumps({"event": "stop", "streamSid": sid}))
+            await asyncio.sleep(0.5)
+            receiver.cancel()
+    except websockets.ConnectionClosed as e:
+        # 1013: turned away by the worker's admission control (MAX_CALLS).
+        if e.rcvd is not None and e.rcvd.code == 1013:
+            stats.shed = True
+        else:
+            stats.error = repr(e)
+    except Exception as e:
+        stats.error = repr(e)
+
+
+def bucket_percentile(buckets, q):
+    """Approximate percentile from cumulative (upper_bound, count) buckets."""
+    total = buckets[-1][1]
+    if not total:
+        return float("nan")
+    target, prev_le, prev_count = q * total, 0.0, 0
+    for le, count in buckets:
+        if count >= target:
+            if le == float("inf"):
+                return prev_le
+            return prev_le + (le - prev_le) * (target - prev_count) / max(count - prev_count, 1)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+def stage_table(metrics_text):
+    stages = {}
+    for m in re.finditer(r'voice_turn_stage_seconds_bucket\{le="([^"]+)",stage="([^"]+)"\} (\S+)', metrics_text):
+        stages.setdefault(m.group(2), []).append((float(m.group(1)), float(m.group(3))))
+    return {
+        stage: {"count": int(b[-1][1]), "p50_ms": bucket_percentile(b, 0.5) * 1000, "p95_ms": bucket_percentile(b, 0.95) * 1000}
+        for stage, b in stages.items()
+    }
+
+
+def call_setup(metrics_text):
+    buckets = [(float(m.group(1)), float(m.group(2)))
+               for m in re.finditer(r'voice_call_setup_seconds_bucket\{le="([^"]+)"\} (\S+)', metrics_text)]
+    if not buckets:
+        return {"count": 0, "p50_ms": float("nan"), "p95_ms": float("nan")}
+    return {"count": int(buckets[-1][1]), "p50_ms": bucket_percentile(buckets, 0.5) * 1000,
+            "p95_ms": bucket_percentile(buckets, 0.95) * 1000}
+
+
+def worker_env(args, upstream_port, aai_port):
+    env = dict(os.environ)
+    env.update({
+        "ASAI_URL": f"ws://127.0.0.1:{aai_port}/v3/ws?sample_rate=8000&encoding=pcm_mulaw",
+        "ASAI_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "OPENAI_API_KEY": "loadtest",
+        "SPEECHMATICS_TTS_URL": f"http://127.0.0.1:{upstream_port}/tts",
+        "SPEECHMATICS_API_KEY": "loadtest",
+        "QDRANT_URL": ":memory:",
+        "VECTOR_BACKEND": "qdrant",
+        # Keep fake audio and embeddings out of the real on-disk caches.
+        "PHRASE_CACHE_DIR": "",
+        "EMBED_CACHE_PATH": "",
+        # A local keyword index would not match the seeded chunks.
+        "KEYWORD_SEARCH": "0",
+        "PYTHONWARNINGS": "ignore",
+    })
+    for kv in args.env:
+        key, _, value = kv.partition("=")
+        env[key] = value
+    return env
+
+
+async def wait_ready(client, base, proc, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"worker exited with {proc.returncode}")
+        try:
+            if (await client.get(f"{base}/media")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("worker did not start")
+
+
+def pct(values, q):
+    return float(np.percentile(values, q) * 1000) if values else float("nan")
+
+
+async def run(args):
+    config = FakeConfig(
+        llm_first_token=args.llm_latency,
+        embed_latency=args.embed_latency,
+        tts_first_byte=args.tts_latency,
+        turn_every=args.turn_every,
+        stt_handshake=args.stt_latency,
+    )
+    upstream_port, worker_port = free_port(), free_port()
+    upstream = uvicorn.Server(uvicorn.Config(upstream_app(config), host="127.0.0.1", port=upstream_port, log_level="warning"))
+    upstream_task = asyncio.create_task(upstream.serve())
+    aai = await serve_assemblyai(config)
+    aai_port = aai.sockets[0].getsockname()[1]
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "loadtest.serve", "--port", str(worker_port), "--docs", str(args.docs)],
+        env=worker_env(args, upstream_port, aai_port),
+    )
+    base = f"http://127.0.0.1:{worker_port}"
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            await wait_ready(client, base, proc)
+            before = (await client.get(f"{base}/loadtest/probe")).json()
+            driver_cpu, t0 = time.process_time(), time.monotonic()
+
+            calls = [CallStats() for _ in range(args.calls)]
+            tasks = []
+            for i, stats in enumerate(calls):
+                tasks.append(asyncio.create_task(
+                    twilio_call(i, f"ws://127.0.0.1:{worker_port}/media", config, args.duration, args.frame_ms, stats)
+                ))
+                await asyncio.sleep(args.ramp / max(args.calls, 1))
+            await asyncio.gather(*tasks)
+
+            wall = time.monotonic() - t0
+            driver_cpu = time.process_time() - driver_cpu
+            after = (await client.get(f"{base}/loadtest/probe")).json()
+            metrics_text = (await client.get(f"{base}/metrics")).text
+            stages = stage_table(metrics_text)
+            setup = call_setup(metrics_text)
+            server_stats = (await client.get(f"{base}/stats")).json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        aai.close()
+        upstream.should_exit = True
+        await upstream_task
+
+    latencies = [l for c in calls for l in c.latencies]
+    failed = [c.error for c in calls if c.error]
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    report = {
+        "calls": args.calls,
+        "failed": len(failed),
+        "shed": sum(c.shed for c in calls),
+        "errors": failed[:5],
+        "turns": len(latencies),
+        "clears": sum(c.clears for c in calls),
+        "first_audio_ms": {q: pct(latencies, int(q[1:])) for q in ("p50", "p90", "p99")},
+        "stages": stages,
+        "call_setup_ms": setup,
+        "stt_pool": server_stats["stt_pool"],
+        "admission": server_stats["admission"],
+        "answer_cache": server_stats["answer_cache"],
+        "stt_sessions_opened": config.stt_sessions,
+        "loop_lag_ms": after["lag_ms"],
+        "worker_cpu_pct": 100 * cpu / wall,
+        "cpu_ms_per_call_second": 1000 * cpu / (args.calls * args.duration),
+        "worker_max_rss_mb": after["max_rss_mb"],
+        "driver_cpu_pct": 100 * driver_cpu / wall,
+    }
+    return report
+
+
+def print_report(r):
+    print(f"calls={r['calls']} failed={r['failed']} shed={r['shed']} turns={r['turns']} barge-in clears={r['clears']}")
+    for err in r["errors"]:
+        print(f"  error: {err}")
+    fa = r["first_audio_ms"]
+    print(f"first audio after end-of-turn: p50={fa['p50']:.0f}ms p90={fa['p90']:.0f}ms p99={fa['p99']:.0f}ms")
+    print(f"{'stage':<16}{'turns':>7}{'~p50 ms':>10}{'~p95 ms':>10}")
+    for stage, s in r["stages"].items():
+        print(f"{stage:<16}{s['count']:>7}{s['p50_ms']:>10.0f}{s['p95_ms']:>10.0f}")
+    setup, pool = r["call_setup_ms"], r["stt_pool"]
+    print(f"call setup: ~p50={setup['p50_ms']:.0f}ms ~p95={setup['p95_ms']:.0f}ms; "
+          f"stt sessions pooled={pool['pooled']} direct={pool['direct']} opened upstream={r['stt_sessions_opened']}")
+    if r["answer_cache"]:
+        ac = r["answer_cache"]
+        print(f"answer cache: hits={ac['hits']} misses={ac['misses']} entries={ac['entries']}")
+    for name, a in r["admission"].items():
+        if a["limit"] or a["rejected"]:
+            print(f"admission {name}: limit={a['limit']} admitted={a['admitted']} rejected={a['rejected']}")
+    lag = r["loop_lag_ms"]
+    print(f"worker loop lag: p50={lag['p50']:.1f}ms p99={lag['p99']:.1f}ms max={lag['max']:.1f}ms")
+    print(f"worker cpu: {r['worker_cpu_pct']:.0f}% of one core, {r['cpu_ms_per_call_second']:.1f} ms per call-second, "
+          f"max rss {r['worker_max_rss_mb']:.0f} MB")
+    print(f"driver cpu: {r['driver_cpu_pct']:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=45.0, help="seconds each call streams audio")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which calls are started")
+    parser.add_argument("--frame-ms", type=int, default=20, help="Twilio media frame size")
+    parser.add_argument("--turn-every", type=float, default=15.0, help="seconds of caller audio between questions")
+    parser.add_argument("--llm-latency", type=float, default=0.35, help="fake LLM time to first token")
+    parser.add_argument("--embed-latency", type=float, default=0.08)
+    parser.add_argument("--tts-latency", type=float, default=0.15, help="fake TTS time to first byte")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="fake STT WebSocket handshake time")
+    parser.add_argument("--docs", type=int, default=1000, help="chunks seeded into local-mode Qdrant")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra worker env, repeatable")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
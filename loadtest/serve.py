@@ -0,0 +1,100 @@
+"""
+Runs RAG.server:app under uvicorn for a load test (started by loadtest.run).
+
+Adds what the driver needs to observe the worker from outside:
+- the local-mode Qdrant collection (QDRANT_URL=":memory:") is seeded with
+  synthetic course descriptions embedded by loadtest.fakes.fake_embedding,
+  so searches return real hits;
+- an event-loop lag monitor (how late a 50 ms sleep wakes up);
+- GET /loadtest/probe returning process CPU time, RSS and lag percentiles
+  since the previous probe.
+"""
+import argparse
+import asyncio
+import logging
+import resource
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+import uvicorn
+from qdrant_client.models import PointStruct
+
+from RAG import server
+from loadtest.fakes import QUESTIONS, fake_embedding
+
+LAG_INTERVAL = 0.05
+_lag = deque(maxlen=100_000)
+
+TOPICS = ["data structures", "machine learning", "computer networks", "operating systems",
+          "computer vision", "compilers", "databases", "security", "graphics", "robotics"]
+
+
+async def lag_monitor():
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        _lag.append(time.perf_counter() - t0 - LAG_INTERVAL)
+
+
+async def seed(store, docs: int, batch: int = 256):
+    texts = [
+        f"EECS {100 + i} {TOPICS[i % len(TOPICS)]}: {QUESTIONS[i % len(QUESTIONS)]}. Section {i}."
+        for i in range(docs)
+    ]
+    for start in range(0, docs, batch):
+        await store.client.upsert(store.collection, points=[
+            PointStruct(id=str(uuid.UUID(int=i + 1)), vector=fake_embedding(texts[i], store.dim).tolist(),
+                        payload={"source": "loadtest", "text": texts[i]})
+            for i in range(start, min(start + batch, docs))
+        ])
+
+
+def install(docs: int):
+    inner = server.app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with inner(app):
+            if docs and hasattr(server.retriever.store, "client"):
+                await seed(server.retriever.store, docs)
+            monitor = asyncio.create_task(lag_monitor())
+            try:
+                yield
+            finally:
+                monitor.cancel()
+
+    server.app.router.lifespan_context = lifespan
+
+    @server.app.get("/loadtest/probe")
+    def probe():
+        lag = np.array(_lag) * 1000 if _lag else np.zeros(1)
+        _lag.clear()
+        return {
+            "cpu_seconds": time.process_time(),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "lag_ms": {
+                "p50": float(np.percentile(lag, 50)),
+                "p99": float(np.percentile(lag, 99)),
+                "max": float(lag.max()),
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--docs", type=int, default=1000, help="synthetic chunks seeded into local-mode Qdrant")
+    args = parser.parse_args()
+    install(args.docs)
+    # One INFO line per upstream request would dominate the worker's output (and CPU).
+    for name in ("httpx", "httpx2", "openai"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning", ws_max_size=2**20)
+
+
+if __name__ == "__main__":
+    main()